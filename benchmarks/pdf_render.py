@@ -0,0 +1,196 @@
+"""
+Бенчмарк рендера PDF коммерческих предложений (seneca.pdf).
+
+Работает офлайн: поднимает тестовую SQLite-базу (как manage.py test),
+засевает её предложениями и замеряет:
+
+* холодный первый рендер в отдельном чистом интерпретаторе (как в
+  benchmarks/startup.py) — импорт seneca.pdf и ReportLab, регистрация
+  шрифта, декодирование логотипа, компиляция шаблона;
+* тёплый рендер для 1, 100 и 1000 предложений — с логотипом и без,
+  с блоком контактов клиента и без: время на документ (mean/p50/p95),
+  пиковую память (tracemalloc) и размер PDF.
+
+    python benchmarks/pdf_render.py --output bench_output.txt
+    python benchmarks/pdf_render.py --sizes 1 100 --compare baseline.json
+
+Отчёт — JSON. С --compare сравнивает p50 тёплых сценариев с прошлым
+отчётом и завершается с кодом 1, если какой-то сценарий медленнее
+более чем в --threshold раз.
+"""
+import argparse
+import itertools
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'seneca_project.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.db import connection  # noqa: E402
+from django.test.utils import setup_test_environment  # noqa: E402
+
+from seneca.models import (  # noqa: E402
+    Application, Block, Floor, Plan, Proposal, ProposalTemplate,
+)
+
+# пиковую память меряем на первых N документах сценария: рендеры независимы,
+# и пик не растёт с количеством, а tracemalloc заметно замедляет рендер
+MEMORY_SAMPLE = 20
+
+
+def seed(count):
+    block = Block.objects.create(name='A')
+    floor = Floor.objects.create(block=block, level='1')
+    Plan.objects.create(floor=floor, price_per_m2=450000)
+    template = ProposalTemplate.objects.create(name='Бенчмарк', content='')
+
+    applications = Application.objects.bulk_create(
+        Application(name=f'Клиент {i}', phone=f'+7700{i:07d}') for i in range(count)
+    )
+    Proposal.objects.bulk_create(
+        Proposal(
+            template=template, application=app, block=block, floor=floor,
+            area=40 + i % 60, finish_level='basic',
+            price_per_m2=450000, total_price=450000 * (40 + i % 60),
+        )
+        for i, app in enumerate(applications)
+    )
+
+
+def contexts(count, with_client):
+    qs = Proposal.objects.select_related('template', 'block', 'floor', 'application')
+    result = []
+    for proposal in qs.order_by('id')[:count]:
+        if not with_client:
+            proposal.application = None
+        result.append(proposal.pdf_context())
+    return result
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+# контекст рендера — обычный dict строк, поэтому процессу-замерщику БД не нужна
+COLD_PROBE = """
+import json, os, sys, time
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'seneca_project.settings')
+import django
+django.setup()
+ctx = json.load(sys.stdin)
+preloaded = any(m.startswith('reportlab') for m in sys.modules)
+t0 = time.perf_counter()
+from seneca import pdf
+pdf.render_proposal_pdf(ctx)
+print(json.dumps({'ms': (time.perf_counter() - t0) * 1000, 'reportlab_preloaded': preloaded}))
+"""
+
+
+def measure_cold(ctx):
+    out = subprocess.run(
+        [sys.executable, '-c', COLD_PROBE], input=json.dumps(ctx),
+        cwd=ROOT, check=True, capture_output=True, text=True,
+    ).stdout
+    result = json.loads(out.strip().splitlines()[-1])
+    if result['reportlab_preloaded']:
+        sys.exit('ReportLab импортирован до холодного замера')
+    return result['ms']
+
+
+def measure_scenario(ctxs, logo):
+    from seneca.pdf import render_proposal_pdf
+
+    timings = []
+    sizes = []
+    for ctx in ctxs:
+        t0 = time.perf_counter()
+        data = render_proposal_pdf(ctx, logo=logo)
+        timings.append((time.perf_counter() - t0) * 1000)
+        sizes.append(len(data))
+
+    tracemalloc.start()
+    for ctx in ctxs[:MEMORY_SAMPLE]:
+        render_proposal_pdf(ctx, logo=logo)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'total_ms': round(sum(timings), 1),
+        'mean_ms': round(statistics.mean(timings), 2),
+        'p50_ms': round(percentile(timings, 50), 2),
+        'p95_ms': round(percentile(timings, 95), 2),
+        'peak_memory_kb': round(peak / 1024, 1),
+        'size_bytes_mean': round(statistics.mean(sizes)),
+        'size_bytes_total': sum(sizes),
+    }
+
+
+def compare(report, baseline_path, threshold):
+    with open(baseline_path) as f:
+        baseline = {s['name']: s for s in json.load(f)['scenarios']}
+    regressions = []
+    for scenario in report['scenarios']:
+        old = baseline.get(scenario['name'])
+        if old and scenario['p50_ms'] > old['p50_ms'] * threshold:
+            regressions.append(
+                f"{scenario['name']}: p50 {old['p50_ms']} → {scenario['p50_ms']} мс"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 100, 1000])
+    parser.add_argument('--output', default=None)
+    parser.add_argument('--compare', default=None, help='JSON-отчёт прошлого прогона')
+    parser.add_argument('--threshold', type=float, default=1.2)
+    args = parser.parse_args()
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        seed(max(args.sizes))
+        report = {
+            'benchmark': 'pdf_render',
+            'cold_first_render_ms': round(measure_cold(contexts(1, True)[0]), 1),
+            'scenarios': [],
+        }
+        for size, logo, with_client in itertools.product(args.sizes, (True, False), (True, False)):
+            ctxs = contexts(size, with_client)
+            report['scenarios'].append({
+                'name': f"n={size} logo={'on' if logo else 'off'} client={'on' if with_client else 'off'}",
+                'proposals': size,
+                'logo': logo,
+                'client_section': with_client,
+                **measure_scenario(ctxs, logo),
+            })
+        report['max_rss_kb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    print(text)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+
+    if args.compare:
+        regressions = compare(report, args.compare, args.threshold)
+        if regressions:
+            sys.exit('Регрессия рендера PDF:\n' + '\n'.join(regressions))
+
+
+if __name__ == '__main__':
+    main()
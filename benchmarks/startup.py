@@ -0,0 +1,78 @@
+"""
+Замер времени старта Django-процесса: django.setup() + импорт seneca.models
+и URLConf (а вместе с ним и админки). Каждый прогон — отдельный чистый
+интерпретатор, поэтому кеш импортов не искажает результат.
+
+    python benchmarks/startup.py --runs 10 --output bench_output.txt
+
+Печатает JSON-отчёт; с --max-ms завершается с кодом 1, если медиана
+превысила порог, — удобно для CI.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import json, os, sys, time
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'seneca_project.settings')
+t0 = time.perf_counter()
+import django
+django.setup()
+t1 = time.perf_counter()
+import seneca.models
+import seneca_project.urls
+t2 = time.perf_counter()
+print(json.dumps({
+    'setup_ms': (t1 - t0) * 1000,
+    'total_ms': (t2 - t0) * 1000,
+    'reportlab_loaded': any(m.startswith('reportlab') for m in sys.modules),
+}))
+"""
+
+
+def run_probe():
+    out = subprocess.run(
+        [sys.executable, '-c', PROBE],
+        cwd=ROOT, check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--max-ms', type=float, default=None)
+    parser.add_argument('--output', default=None)
+    args = parser.parse_args()
+
+    samples = [run_probe() for _ in range(args.runs)]
+    totals = [s['total_ms'] for s in samples]
+    report = {
+        'benchmark': 'startup',
+        'runs': args.runs,
+        'setup_ms_median': round(statistics.median(s['setup_ms'] for s in samples), 1),
+        'total_ms_median': round(statistics.median(totals), 1),
+        'total_ms_min': round(min(totals), 1),
+        'total_ms_max': round(max(totals), 1),
+        'reportlab_loaded': any(s['reportlab_loaded'] for s in samples),
+    }
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+
+    if report['reportlab_loaded']:
+        sys.exit('ReportLab импортируется при старте')
+    if args.max_ms is not None and report['total_ms_median'] > args.max_ms:
+        sys.exit(f"Старт {report['total_ms_median']} мс > порога {args.max_ms} мс")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,9 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+import csv
+import tempfile
 import openpyxl
 from io import BytesIO
-from django.http import HttpResponse
+from django.http import FileResponse, StreamingHttpResponse
 from .models import *
 from django.shortcuts import redirect, get_object_or_404
 from django.utils.html import format_html
@@ -10,6 +12,7 @@ from django import forms
 from django.urls import path, reverse
 from .views import *
 from django.contrib.admin import AdminSite
+from django.conf import settings
 
 
 class ObjectAdminSite(AdminSite):
@@ -29,37 +32,110 @@ class ObjectAdminSite(AdminSite):
 object_admin = ObjectAdminSite(name='object_admin')
 
 
+EXPORT_HEADERS = ['ID', 'Имя', 'Телефон', 'Статус', 'Комментарий', 'Дата создания']
+EXPORT_CHUNK_SIZE = 2000
+
+
+def _export_rows(queryset):
+    """Строки выгрузки без создания объектов модели, чанками с курсора БД."""
+    statuses = dict(Application.STATUS_CHOICES)
+    rows = (
+        queryset.order_by('-created_at')
+                .values_list('id', 'name', 'phone', 'status', 'comment', 'created_at')
+                .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    for pk, name, phone, status, comment, created_at in rows:
+        yield [
+            pk,
+            name,
+            phone,
+            statuses.get(status, status),
+            comment,
+            created_at.strftime('%Y-%m-%d %H:%M'),
+        ]
+
+
 @admin.action(description="Экспорт выбранных заявок в Excel")
 def export_applications_xlsx(modeladmin, request, queryset):
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = 'Заявки'
-
-    headers = ['ID', 'Имя', 'Телефон', 'Статус', 'Комментарий', 'Дата создания']
-    ws.append(headers)
-
-    for obj in queryset.order_by('-created_at'):
-        ws.append([
-            obj.id,
-            obj.name,
-            obj.phone,
-            obj.get_status_display(),
-            obj.comment,
-            obj.created_at.strftime('%Y-%m-%d %H:%M'),
-        ])
-
-    output = BytesIO()
+    # write-only режим openpyxl сбрасывает строки на диск по мере записи,
+    # а готовый файл отдаётся с диска — память не зависит от числа строк
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet('Заявки')
+    ws.append(EXPORT_HEADERS)
+    for row in _export_rows(queryset):
+        ws.append(row)
+
+    output = tempfile.TemporaryFile()
     wb.save(output)
     output.seek(0)
 
-    response = HttpResponse(
-        output.read(),
+    return FileResponse(
+        output,
+        as_attachment=True,
+        filename='applications.xlsx',
         content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
     )
-    response['Content-Disposition'] = 'attachment; filename="applications.xlsx"'
+
+
+class _Echo:
+    """Псевдобуфер для csv.writer: write() просто возвращает строку."""
+
+    def write(self, value):
+        return value
+
+
+@admin.action(description="Экспорт выбранных заявок в CSV")
+def export_applications_csv(modeladmin, request, queryset):
+    writer = csv.writer(_Echo())
+
+    def stream():
+        yield '\ufeff'  # BOM, чтобы Excel открыл кириллицу в UTF-8
+        yield writer.writerow(EXPORT_HEADERS)
+        for row in _export_rows(queryset):
+            yield writer.writerow(row)
+
+    response = StreamingHttpResponse(stream(), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = 'attachment; filename="applications.csv"'
     return response
 
 
+@admin.action(description="Сгенерировать PDF для выбранных предложений")
+def generate_proposal_pdfs(modeladmin, request, queryset):
+    count, failed = Proposal.generate_pdfs(queryset)
+    skipped = queryset.count() - count - len(failed)
+    modeladmin.message_user(request, f"Сгенерировано PDF: {count}, без изменений: {skipped}.")
+    if failed:
+        modeladmin.message_user(
+            request,
+            "Не удалось сгенерировать: " + "; ".join(f"#{p.pk}: {error}" for p, error in failed),
+            level=messages.ERROR,
+        )
+
+
+@admin.action(description="Пересчитать цены предложений")
+def reprice_proposals(modeladmin, request, queryset):
+    count = Proposal.reprice(plans=queryset)
+    modeladmin.message_user(request, f"Пересчитано предложений: {count}.")
+
+
+@admin.action(description="Пересчитать цены предложений и обновить PDF")
+def reprice_proposals_and_pdf(modeladmin, request, queryset):
+    count = Proposal.reprice(plans=queryset, regenerate_pdf=True)
+    modeladmin.message_user(
+        request, f"Пересчитано предложений: {count}, PDF поставлены в очередь."
+    )
+
+
+@admin.action(description="Перенести в архив (закрытые и старые)")
+def archive_applications(modeladmin, request, queryset):
+    count = ArchivedApplication.archive(queryset)
+    modeladmin.message_user(
+        request,
+        f"Перенесено в архив: {count}. Остальные не закрыты, закрыты позже "
+        f"{settings.APPLICATION_ARCHIVE_DAYS} дней назад или связаны с предложениями.",
+    )
+
+
 class SiteAwareAdmin(admin.ModelAdmin):
     list_filter = ('site',)
     readonly_fields = ('site',)
@@ -71,7 +147,7 @@ class PhotoAdmin(SiteAwareAdmin):
 
 
 class VideoAdmin(SiteAwareAdmin):
-    list_display = ('id', 'youtube_link', 'year', 'month')
+    list_display = ('id', 'youtube_link', 'year', 'month', 'published_on')
     list_filter = ('year', 'month')
     search_fields = ('youtube_link', 'description')
 
@@ -81,7 +157,23 @@ class ApplicationAdmin(admin.ModelAdmin):
     list_filter = ('status', 'created_at')
     search_fields = ('name', 'phone')
     fields = ('name', 'phone', 'status', 'comment')
-    actions = [export_applications_xlsx]
+    actions = [export_applications_xlsx, export_applications_csv, archive_applications]
+
+    def get_search_results(self, request, queryset, search_term):
+        return queryset.search(search_term), False
+
+
+class ArchivedApplicationAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'phone', 'created_at', 'closed_at', 'archived_at')
+    list_filter = ('closed_at',)
+    search_fields = ('name', 'phone', 'phone_digits')
+    actions = [export_applications_xlsx, export_applications_csv]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
 
 
 class BlockAdmin(SiteAwareAdmin):
@@ -99,6 +191,7 @@ class PlanAdmin(SiteAwareAdmin):
     list_display = ('id', 'floor', 'description')
     list_filter = ('floor__block', 'floor__level')
     search_fields = ('description',)
+    actions = [reprice_proposals, reprice_proposals_and_pdf]
 
 
 class ProposalTemplateForm(forms.ModelForm):
@@ -118,13 +211,14 @@ class ProposalTemplateAdmin(admin.ModelAdmin):
 class ProposalAdmin(admin.ModelAdmin):
     list_display = ('id', 'block', 'floor', 'area', 'finish_level', 'total_price', 'download_link', 'created_at')
     list_filter = ('block', 'floor', 'finish_level', 'created_at')
-    readonly_fields = ('price_per_m2', 'total_price', 'pdf_file', 'created_at', 'generate_button')
+    readonly_fields = ('price_per_m2', 'total_price', 'pdf_file', 'created_at', 'generate_button', 'pdf_job_status')
+    actions = [generate_proposal_pdfs]
 
     fields = (
         'template', 'application',
         'block', 'floor', 'area', 'finish_level',
         'price_per_m2', 'total_price',
-        'generate_button', 'pdf_file',
+        'generate_button', 'pdf_job_status', 'pdf_file',
         'created_at',
     )
 
@@ -132,24 +226,49 @@ class ProposalAdmin(admin.ModelAdmin):
         urls = super().get_urls()
         custom = [
             path('<int:pk>/generate/', self.admin_site.admin_view(self.process_generate), name='proposal-generate'),
+            path('<int:pk>/pdf/', self.admin_site.admin_view(self.process_preview), name='proposal-pdf'),
         ]
         return custom + urls
 
     def generate_button(self, obj):
         if obj.pk:
             return format_html(
-                '<a class="button" href="{}">Сгенерировать PDF</a>',
-                reverse('admin:proposal-generate', args=[obj.pk])
+                '<a class="button" href="{}">Сгенерировать PDF</a> '
+                '<a class="button" href="{}" target="_blank">Просмотр</a>',
+                reverse(f'{self.admin_site.name}:proposal-generate', args=[obj.pk]),
+                reverse(f'{self.admin_site.name}:proposal-pdf', args=[obj.pk]),
             )
         return "Сохраните сначала, чтобы сгенерировать"
     generate_button.short_description = "Генерация PDF"
 
+    def pdf_job_status(self, obj):
+        job = obj.pdf_jobs.last() if obj.pk else None
+        if job is None:
+            return "-"
+        if job.status == ProposalPDFJob.STATUS_FAILED:
+            return f"{job.get_status_display()}: {job.error}"
+        return job.get_status_display()
+    pdf_job_status.short_description = "Статус генерации"
+
     def process_generate(self, request, pk):
         proposal = get_object_or_404(Proposal, pk=pk)
-        proposal.generate_pdf()
-        self.message_user(request, "PDF сгенерирован и сохранён.")
+        ProposalPDFJob.enqueue(proposal)
+        self.message_user(request, "PDF поставлен в очередь на генерацию.")
         return redirect(request.META.get('HTTP_REFERER'))
 
+    def process_preview(self, request, pk):
+        from .pdf import write_proposal_pdf
+
+        # рендерим прямо в буфер ответа, без сохранения в хранилище
+        proposal = get_object_or_404(
+            Proposal.objects.select_related('template', 'block', 'floor', 'application'), pk=pk
+        )
+        buffer = BytesIO()
+        write_proposal_pdf(proposal.pdf_context(), buffer)
+        buffer.seek(0)
+        return FileResponse(buffer, content_type='application/pdf',
+                            filename=f'proposal_{pk}.pdf')
+
     def download_link(self, obj):
         if obj.pdf_file:
             return format_html('<a href="{}" target="_blank">Скачать</a>', obj.pdf_file.url)
@@ -165,6 +284,7 @@ class BankAdmin(admin.ModelAdmin):
 object_admin.register(Photo, PhotoAdmin)
 object_admin.register(Video, VideoAdmin)
 object_admin.register(Application, ApplicationAdmin)
+object_admin.register(ArchivedApplication, ArchivedApplicationAdmin)
 object_admin.register(Block, BlockAdmin)
 object_admin.register(Floor, FloorAdmin)
 object_admin.register(Plan, PlanAdmin)
@@ -0,0 +1,67 @@
+import hashlib
+import json
+
+from django.db import IntegrityError, transaction
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+
+class IdempotentCreateMixin:
+    """
+    Поддержка заголовка Idempotency-Key для create() во вьюсете.
+
+    Ключ записывается в той же транзакции, что и создаваемый объект, поэтому
+    повтор запроса (в том числе параллельный) либо упирается в уникальный
+    индекс и получает сохранённый ответ, либо, если первая попытка
+    откатилась, выполняется заново. Ошибки валидации не сохраняются.
+    """
+    idempotency_header = 'Idempotency-Key'
+
+    def create(self, request, *args, **kwargs):
+        key = request.headers.get(self.idempotency_header)
+        if not key:
+            return super().create(request, *args, **kwargs)
+        if len(key) > IdempotencyKey._meta.get_field('key').max_length:
+            return Response(
+                {'detail': f'{self.idempotency_header} слишком длинный.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        request_hash = hashlib.sha256(
+            json.dumps(request.data, sort_keys=True, default=str).encode()
+        ).hexdigest()
+        stored = IdempotencyKey.lookup(key)
+        if stored is not None:
+            return self.replay(stored, request_hash)
+
+        try:
+            with transaction.atomic():
+                # просроченная запись с тем же ключом освобождает его
+                IdempotencyKey.objects.filter(
+                    key=key, created_at__lt=IdempotencyKey.expiry_cutoff()
+                ).delete()
+                record = IdempotencyKey.objects.create(key=key, request_hash=request_hash)
+                response = super().create(request, *args, **kwargs)
+                record.status_code = response.status_code
+                record.response = response.data
+                record.save(update_fields=['status_code', 'response'])
+        except IntegrityError:
+            # параллельный запрос с тем же ключом успел раньше
+            stored = IdempotencyKey.lookup(key)
+            if stored is None:
+                raise
+            return self.replay(stored, request_hash)
+        return response
+
+    def replay(self, stored, request_hash):
+        if stored.request_hash != request_hash:
+            return Response(
+                {'detail': f'{self.idempotency_header} уже использован с другим телом запроса.'},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            )
+        return Response(
+            stored.response, status=stored.status_code,
+            headers={'Idempotent-Replayed': 'true'},
+        )
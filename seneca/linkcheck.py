@@ -0,0 +1,187 @@
+"""
+Проверка внешних ссылок из видео и планировок.
+
+Ссылки проверяются в пуле потоков через одну requests.Session с пулом
+соединений, так что соединения с хостом переиспользуются. Число
+одновременных запросов к одному хосту ограничено семафором, чтобы не
+упереться в rate limit (YouTube). Общее время растёт с самым медленным
+хостом, а не с числом ссылок.
+
+Результаты хранятся в LinkCheckResult: recheck() (команда check_links)
+проверяет только новые ссылки и ссылки с устаревшим результатом, а
+LinkCheckerView отдаёт сохранённый отчёт без обращений к сети.
+"""
+import datetime
+import re
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from django.utils import timezone
+from requests.adapters import HTTPAdapter
+
+from . import oembed
+from .models import LinkCheckResult, Plan, Video
+
+YOUTUBE_HOSTS = ('youtube.com', 'youtu.be')
+URL_PATTERN = re.compile(r'https?://[^\s\'"]+')
+
+
+def extract_urls():
+    """Все внешние ссылки: youtube_link и ссылки из описаний видео и планировок."""
+    urls = []
+    for v in Video.objects.only('id', 'youtube_link', 'description'):
+        urls.append({
+            'model': 'Video',
+            'id': v.id,
+            'field': 'youtube_link',
+            'url': v.youtube_link,
+        })
+        for match in URL_PATTERN.findall(v.description or ''):
+            urls.append({
+                'model': 'Video',
+                'id': v.id,
+                'field': 'description',
+                'url': match,
+            })
+
+    for p in Plan.objects.only('id', 'description'):
+        for match in URL_PATTERN.findall(p.description or ''):
+            urls.append({
+                'model': 'Plan',
+                'id': p.id,
+                'field': 'description',
+                'url': match,
+            })
+
+    return urls
+
+
+def recheck(ttl_hours=None, **checker_options):
+    """
+    Проверяет ссылки без результата (новые — в том числе после правки
+    видео или планировки) и с результатом старше ttl_hours, сохраняет
+    результаты и удаляет записи о ссылках, которых больше нет.
+    Возвращает (проверено, удалено).
+    """
+    if ttl_hours is None:
+        ttl_hours = settings.LINK_CHECK_TTL_HOURS
+    cutoff = timezone.now() - datetime.timedelta(hours=ttl_hours)
+
+    by_hash = {LinkCheckResult.hash_url(item['url']): item['url'] for item in extract_urls()}
+    fresh = set(
+        LinkCheckResult.objects.filter(checked_at__gte=cutoff).values_list('url_hash', flat=True)
+    )
+    to_check = [url for url_hash, url in by_hash.items() if url_hash not in fresh]
+
+    with LinkChecker(**checker_options) as checker:
+        checked = checker.check_many(to_check)
+    now = timezone.now()
+    error_length = LinkCheckResult._meta.get_field('error').max_length
+    results = []
+    for url, (status, latency_ms) in checked.items():
+        is_code = isinstance(status, int)
+        results.append(LinkCheckResult(
+            url_hash=LinkCheckResult.hash_url(url),
+            url=url,
+            status_code=status if is_code else None,
+            error='' if is_code else str(status)[:error_length],
+            ok=is_code and 200 <= status < 400,
+            latency_ms=latency_ms,
+            checked_at=now,
+        ))
+    LinkCheckResult.objects.bulk_create(
+        results, batch_size=500, update_conflicts=True, unique_fields=['url_hash'],
+        update_fields=['url', 'status_code', 'error', 'ok', 'latency_ms', 'checked_at'],
+    )
+    oembed.store(checker.oembed_payloads)
+
+    orphaned = [
+        pk for pk, url_hash in LinkCheckResult.objects.values_list('pk', 'url_hash')
+        if url_hash not in by_hash
+    ]
+    for start in range(0, len(orphaned), 500):
+        LinkCheckResult.objects.filter(pk__in=orphaned[start:start + 500]).delete()
+    return len(results), len(orphaned)
+
+
+class LinkChecker:
+    """
+    check_many(urls) → {url: (статус, время ответа в мс)}, где статус —
+    HTTP-код или текст ошибки. Ответы oEmbed, полученные по дороге,
+    остаются в oembed_payloads.
+    """
+
+    def __init__(self, timeout=3, max_workers=16, per_host=4):
+        self.timeout = timeout
+        self.max_workers = max_workers
+        self.per_host = per_host
+        self.oembed_payloads = {}
+        self._host_slots = defaultdict(lambda: threading.BoundedSemaphore(self.per_host))
+        self._host_slots_lock = threading.Lock()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def host_slot(self, url):
+        host = (urlsplit(url).hostname or '').lower()
+        with self._host_slots_lock:
+            return self._host_slots[host]
+
+    def check_many(self, urls):
+        urls = list(dict.fromkeys(urls))  # каждую ссылку — один раз
+        if not urls:
+            return {}
+        workers = min(self.max_workers, len(urls))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return dict(zip(urls, pool.map(self.check_timed, urls)))
+
+    def check_timed(self, url):
+        started = time.perf_counter()
+        status = self.check(url)
+        return status, round((time.perf_counter() - started) * 1000)
+
+    def check(self, url):
+        head_error = None
+
+        try:
+            with self.host_slot(url):
+                head = self.session.head(url, allow_redirects=True, timeout=self.timeout)
+            if 200 <= head.status_code < 400:
+                if any(host in url for host in YOUTUBE_HOSTS):
+                    return self.check_youtube_oembed(url)
+                return head.status_code
+        except Exception as e:
+            head_error = str(e)
+
+        try:
+            # stream=True: нужен только статус, тело не скачиваем
+            with self.host_slot(url), \
+                 self.session.get(url, allow_redirects=True, timeout=self.timeout, stream=True) as get:
+                return get.status_code
+        except Exception as e_get:
+            return head_error or str(e_get)
+
+    def check_youtube_oembed(self, url):
+        # полученный ответ не выбрасываем: его сохранит в видео oembed.store()
+        try:
+            with self.host_slot(oembed.endpoint()):
+                self.oembed_payloads[url] = oembed.fetch(url, session=self.session, timeout=self.timeout)
+            return 200
+        except oembed.OEmbedError as e:
+            return e.status or f'oEmbed error: {e}'
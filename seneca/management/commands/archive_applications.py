@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from seneca.models import ArchivedApplication
+
+
+class Command(BaseCommand):
+    help = 'Переносит старые закрытые заявки в архивную таблицу'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=settings.APPLICATION_ARCHIVE_DAYS,
+            help='Архивировать заявки, закрытые раньше стольких дней назад',
+        )
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        moved = ArchivedApplication.archive(
+            older_than_days=options['days'],
+            batch_size=options['batch_size'],
+        )
+        self.stdout.write(f'Перенесено в архив: {moved}')
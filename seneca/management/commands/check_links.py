@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from seneca import linkcheck
+
+
+class Command(BaseCommand):
+    help = 'Проверяет новые и устаревшие внешние ссылки и сохраняет результаты'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ttl-hours', type=float, default=settings.LINK_CHECK_TTL_HOURS,
+            help='Перепроверять результаты старше стольких часов (0 — все ссылки)',
+        )
+        parser.add_argument('--timeout', type=float, default=3)
+        parser.add_argument('--workers', type=int, default=16)
+        parser.add_argument(
+            '--per-host', type=int, default=4,
+            help='Одновременных запросов к одному хосту',
+        )
+
+    def handle(self, *args, **options):
+        checked, removed = linkcheck.recheck(
+            ttl_hours=options['ttl_hours'],
+            timeout=options['timeout'],
+            max_workers=options['workers'],
+            per_host=options['per_host'],
+        )
+        self.stdout.write(f'Проверено ссылок: {checked}, удалено устаревших записей: {removed}')
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from seneca.models import ProposalPDFJob
+
+
+class Command(BaseCommand):
+    help = 'Воркер очереди генерации PDF коммерческих предложений'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Обработать текущую очередь и завершиться',
+        )
+        parser.add_argument(
+            '--sleep', type=float, default=2.0,
+            help='Пауза между опросами пустой очереди, в секундах',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            job = ProposalPDFJob.claim_next()
+            if job is None:
+                if options['once']:
+                    return
+                time.sleep(options['sleep'])
+                continue
+
+            job.run()
+            if job.status == ProposalPDFJob.STATUS_FAILED:
+                self.stderr.write(f'Задача #{job.pk}: {job.error}')
+            else:
+                self.stdout.write(f'Задача #{job.pk}: PDF для предложения #{job.proposal_id} готов')
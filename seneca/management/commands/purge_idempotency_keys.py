@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from seneca.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = 'Удаляет просроченные ключи идемпотентности (старше IDEMPOTENCY_KEY_TTL_HOURS)'
+
+    def handle(self, *args, **options):
+        deleted = IdempotencyKey.purge()
+        self.stdout.write(f'Удалено ключей: {deleted}')
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from seneca.models import ApplicationDailyStats
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает дневную сводку заявок по таблице Application'
+
+    def handle(self, *args, **options):
+        days = ApplicationDailyStats.rebuild()
+        self.stdout.write(f'Пересчитано дней: {days}')
@@ -0,0 +1,29 @@
+import requests
+from django.core.management.base import BaseCommand
+
+from seneca import oembed
+
+
+class Command(BaseCommand):
+    help = 'Обновляет метаданные YouTube oEmbed (название, превью) у видео'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Обновить все видео, а не только без метаданных или устаревшие',
+        )
+        parser.add_argument('--batch-size', type=int, default=100)
+
+    def handle(self, *args, **options):
+        videos = oembed.stale_videos(max_age_hours=0 if options['all'] else None)
+        batch_size = options['batch_size']
+        pks = list(videos.order_by('pk').values_list('pk', flat=True))
+
+        updated = failed = 0
+        with requests.Session() as session:
+            for start in range(0, len(pks), batch_size):
+                batch = videos.model.objects.filter(pk__in=pks[start:start + batch_size])
+                ok, errors = oembed.refresh(batch, session=session)
+                updated += ok
+                failed += errors
+        self.stdout.write(f'Обновлено видео: {updated}, ошибок: {failed}')
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from seneca.models import Plan, Proposal
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает цены коммерческих предложений по текущим ценам планировок'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--plan', type=int, action='append', dest='plans',
+            help='ID планировки (можно указать несколько раз); по умолчанию все',
+        )
+        parser.add_argument(
+            '--regenerate-pdf', action='store_true',
+            help='Поставить изменённые предложения в очередь на генерацию PDF',
+        )
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        plans = None
+        if options['plans']:
+            plans = Plan.objects.filter(pk__in=options['plans'])
+
+        count = Proposal.reprice(
+            plans=plans,
+            regenerate_pdf=options['regenerate_pdf'],
+            batch_size=options['batch_size'],
+        )
+        self.stdout.write(f'Пересчитано предложений: {count}')
@@ -0,0 +1,48 @@
+import time
+
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from seneca.models import AdminNotification
+
+
+class Command(BaseCommand):
+    help = 'Воркер отправки уведомлений администраторам из outbox'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Отправить накопившиеся уведомления и завершиться',
+        )
+        parser.add_argument(
+            '--digest', action='store_true',
+            help='Объединять накопившиеся уведомления в одно письмо',
+        )
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument(
+            '--sleep', type=float, default=10.0,
+            help='Пауза между проходами, в секундах',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            if AdminNotification.pending().exists():
+                try:
+                    # одно SMTP-соединение на весь проход по очереди
+                    with get_connection() as connection:
+                        sent, failed = AdminNotification.send_pending(
+                            connection,
+                            digest=options['digest'],
+                            batch_size=options['batch_size'],
+                        )
+                    self.stdout.write(f'Отправлено уведомлений: {sent}, ошибок: {failed}')
+                except Exception as e:
+                    self.stderr.write(f'Ошибка отправки: {e}')
+                    if options['once']:
+                        raise
+
+            if options['once']:
+                return
+            time.sleep(options['sleep'])
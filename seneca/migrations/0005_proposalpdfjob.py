@@ -0,0 +1,31 @@
+# Generated by Django 5.2.1 on 2026-10-18 15:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seneca', '0004_bank'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProposalPDFJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('queued', 'В очереди'), ('running', 'Выполняется'), ('done', 'Готово'), ('failed', 'Ошибка')], db_index=True, default='queued', max_length=10, verbose_name='Статус')),
+                ('error', models.TextField(blank=True, verbose_name='Ошибка')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('proposal', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pdf_jobs', to='seneca.proposal', verbose_name='Предложение')),
+            ],
+            options={
+                'verbose_name': 'Задача генерации PDF',
+                'verbose_name_plural': 'Задачи генерации PDF',
+                'ordering': ['created_at', 'id'],
+            },
+        ),
+    ]
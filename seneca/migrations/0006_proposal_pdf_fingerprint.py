@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 15:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seneca', '0005_proposalpdfjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='proposal',
+            name='pdf_fingerprint',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+    ]
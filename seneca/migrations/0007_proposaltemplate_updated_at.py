@@ -0,0 +1,25 @@
+# Generated by Django 5.2.1 on 2026-10-18 16:05
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seneca', '0006_proposal_pdf_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='proposaltemplate',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AlterField(
+            model_name='proposaltemplate',
+            name='content',
+            field=models.TextField(help_text='Доступно: {created_at}, {block_name}, {floor}, {finish_level}, {area}, {price_per_m2}, {total_price}, {client_name}, {client_phone}. Абзац из одного {price_table} или {client_section} заменяется таблицей цен или контактами клиента.', verbose_name='Текстовый шаблон (plain-text, с {placeholders})'),
+        ),
+    ]
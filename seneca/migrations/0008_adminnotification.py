@@ -0,0 +1,30 @@
+# Generated by Django 5.2.1 on 2026-10-18 15:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seneca', '0007_proposaltemplate_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AdminNotification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject', models.CharField(max_length=255, verbose_name='Тема')),
+                ('message', models.TextField(verbose_name='Текст')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('sent_at', models.DateTimeField(blank=True, db_index=True, null=True)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+            ],
+            options={
+                'verbose_name': 'Уведомление администратора',
+                'verbose_name_plural': 'Уведомления администраторов',
+                'ordering': ['id'],
+            },
+        ),
+    ]
@@ -0,0 +1,100 @@
+# Generated by Django 5.2.1 on 2026-10-18 15:55
+
+import re
+
+from django.db import migrations, models
+
+
+# FTS5-таблица с внешним содержимым: сами данные лежат в seneca_application,
+# триггеры держат индекс в актуальном состоянии при любых INSERT/UPDATE/DELETE,
+# включая bulk_create и QuerySet.update.
+# Внимание: если будущая миграция пересоздаёт seneca_application на SQLite
+# (AlterField и т.п.), триггеры удаляются вместе со старой таблицей —
+# их нужно создать заново и выполнить 'rebuild'.
+FTS_SQL = [
+    """
+    CREATE VIRTUAL TABLE seneca_application_fts USING fts5(
+        name, phone_digits,
+        content='seneca_application', content_rowid='id',
+        tokenize='trigram'
+    )
+    """,
+    """
+    CREATE TRIGGER seneca_application_fts_ai AFTER INSERT ON seneca_application BEGIN
+        INSERT INTO seneca_application_fts(rowid, name, phone_digits)
+        VALUES (new.id, new.name, new.phone_digits);
+    END
+    """,
+    """
+    CREATE TRIGGER seneca_application_fts_ad AFTER DELETE ON seneca_application BEGIN
+        INSERT INTO seneca_application_fts(seneca_application_fts, rowid, name, phone_digits)
+        VALUES ('delete', old.id, old.name, old.phone_digits);
+    END
+    """,
+    """
+    CREATE TRIGGER seneca_application_fts_au AFTER UPDATE OF name, phone_digits ON seneca_application BEGIN
+        INSERT INTO seneca_application_fts(seneca_application_fts, rowid, name, phone_digits)
+        VALUES ('delete', old.id, old.name, old.phone_digits);
+        INSERT INTO seneca_application_fts(rowid, name, phone_digits)
+        VALUES (new.id, new.name, new.phone_digits);
+    END
+    """,
+    "INSERT INTO seneca_application_fts(seneca_application_fts) VALUES ('rebuild')",
+]
+
+FTS_DROP_SQL = [
+    'DROP TRIGGER IF EXISTS seneca_application_fts_ai',
+    'DROP TRIGGER IF EXISTS seneca_application_fts_ad',
+    'DROP TRIGGER IF EXISTS seneca_application_fts_au',
+    'DROP TABLE IF EXISTS seneca_application_fts',
+]
+
+
+def normalize_phone(phone):
+    digits = re.sub(r'\D', '', phone or '')
+    if len(digits) == 11 and digits.startswith('8'):
+        digits = '7' + digits[1:]
+    return digits
+
+
+def fill_phone_digits(apps, schema_editor):
+    Application = apps.get_model('seneca', 'Application')
+    batch = []
+    for app in Application.objects.only('id', 'phone').iterator(chunk_size=2000):
+        app.phone_digits = normalize_phone(app.phone)
+        batch.append(app)
+        if len(batch) >= 2000:
+            Application.objects.bulk_update(batch, ['phone_digits'])
+            batch = []
+    Application.objects.bulk_update(batch, ['phone_digits'])
+
+
+def create_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in FTS_SQL:
+        schema_editor.execute(sql)
+
+
+def drop_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in FTS_DROP_SQL:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seneca', '0008_adminnotification'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='application',
+            name='phone_digits',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=20, verbose_name='Телефон (цифры)'),
+        ),
+        migrations.RunPython(fill_phone_digits, migrations.RunPython.noop),
+        migrations.RunPython(create_fts, drop_fts),
+    ]
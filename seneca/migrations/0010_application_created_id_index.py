@@ -0,0 +1,17 @@
+# Generated by Django 5.2.1 on 2026-10-18 15:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seneca', '0009_application_phone_digits'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='application',
+            index=models.Index(fields=['created_at', 'id'], name='seneca_app_created_id_idx'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.1 on 2026-10-18 15:58
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def fill_daily_stats(apps, schema_editor):
+    Application = apps.get_model('seneca', 'Application')
+    ApplicationDailyStats = apps.get_model('seneca', 'ApplicationDailyStats')
+    days = {}
+    rows = Application.objects.values_list('status', 'created_at', 'updated_at')
+    for status, created_at, updated_at in rows.iterator(chunk_size=2000):
+        day = days.setdefault(timezone.localdate(created_at), ApplicationDailyStats(
+            date=timezone.localdate(created_at)
+        ))
+        setattr(day, f'{status}_count', getattr(day, f'{status}_count') + 1)
+        if status == 'closed':
+            day.processing_seconds += (updated_at - created_at).total_seconds()
+    ApplicationDailyStats.objects.bulk_create(days.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seneca', '0010_application_created_id_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ApplicationDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True, verbose_name='Дата')),
+                ('new_count', models.IntegerField(default=0, verbose_name='Новые')),
+                ('in_work_count', models.IntegerField(default=0, verbose_name='В работе')),
+                ('closed_count', models.IntegerField(default=0, verbose_name='Закрытые')),
+                ('processing_seconds', models.FloatField(default=0, verbose_name='Время обработки закрытых, с')),
+            ],
+            options={
+                'verbose_name': 'Сводка заявок за день',
+                'verbose_name_plural': 'Сводки заявок по дням',
+                'ordering': ['date'],
+            },
+        ),
+        migrations.RunPython(fill_daily_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.1 on 2026-10-18 16:00
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def fill_transitions(apps, schema_editor):
+    # для уже закрытых заявок момент закрытия неизвестен — берём updated_at,
+    # и дальнейшие правки комментария его больше не сдвигают
+    Application = apps.get_model('seneca', 'Application')
+    Transition = apps.get_model('seneca', 'ApplicationStatusTransition')
+    batch = []
+    rows = Application.objects.values_list('id', 'status', 'created_at', 'updated_at')
+    for pk, status, created_at, updated_at in rows.iterator(chunk_size=2000):
+        at = updated_at if status == 'closed' else created_at
+        batch.append(Transition(application_id=pk, to_status=status, at=at))
+        if len(batch) >= 2000:
+            Transition.objects.bulk_create(batch)
+            batch = []
+    Transition.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seneca', '0011_applicationdailystats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ApplicationStatusTransition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('from_status', models.CharField(blank=True, choices=[('new', 'Новая'), ('in_work', 'В работе'), ('closed', 'Закрыта')], max_length=10)),
+                ('to_status', models.CharField(choices=[('new', 'Новая'), ('in_work', 'В работе'), ('closed', 'Закрыта')], max_length=10)),
+                ('at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('application', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='transitions', to='seneca.application')),
+            ],
+            options={
+                'verbose_name': 'Смена статуса заявки',
+                'verbose_name_plural': 'Журнал статусов заявок',
+                'indexes': [models.Index(fields=['application', 'at'], name='seneca_transition_app_at_idx')],
+            },
+        ),
+        migrations.RunPython(fill_transitions, migrations.RunPython.noop),
+    ]
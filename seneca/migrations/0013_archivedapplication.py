@@ -0,0 +1,33 @@
+# Generated by Django 5.2.1 on 2026-10-18 16:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seneca', '0012_applicationstatustransition'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedApplication',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=100, verbose_name='Имя')),
+                ('phone', models.CharField(max_length=20, verbose_name='Телефон')),
+                ('phone_digits', models.CharField(blank=True, db_index=True, max_length=20, verbose_name='Телефон (цифры)')),
+                ('status', models.CharField(choices=[('new', 'Новая'), ('in_work', 'В работе'), ('closed', 'Закрыта')], max_length=10, verbose_name='Статус')),
+                ('comment', models.TextField(blank=True, verbose_name='Комментарий менеджера')),
+                ('created_at', models.DateTimeField(db_index=True, verbose_name='Дата создания')),
+                ('updated_at', models.DateTimeField(verbose_name='Дата обновления')),
+                ('closed_at', models.DateTimeField(verbose_name='Дата закрытия')),
+                ('archived_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата архивации')),
+            ],
+            options={
+                'verbose_name': 'Архивная заявка',
+                'verbose_name_plural': 'Архив заявок',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
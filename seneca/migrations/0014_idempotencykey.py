@@ -0,0 +1,29 @@
+# Generated by Django 5.2.1 on 2026-10-18 16:06
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seneca', '0013_archivedapplication'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdempotencyKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=255, unique=True, verbose_name='Ключ')),
+                ('request_hash', models.CharField(max_length=64, verbose_name='Хеш тела запроса')),
+                ('status_code', models.PositiveSmallIntegerField(null=True, verbose_name='HTTP-статус')),
+                ('response', models.JSONField(null=True, verbose_name='Ответ')),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='Дата создания')),
+            ],
+            options={
+                'verbose_name': 'Ключ идемпотентности',
+                'verbose_name_plural': 'Ключи идемпотентности',
+            },
+        ),
+    ]
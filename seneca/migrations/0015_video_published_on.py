@@ -0,0 +1,51 @@
+# Generated by Django 5.2.1 on 2026-10-18 16:10
+
+import datetime
+
+from django.db import migrations, models
+
+
+MONTHS = {
+    'январь': 1, 'февраль': 2, 'март': 3, 'апрель': 4,
+    'май': 5, 'июнь': 6, 'июль': 7, 'август': 8,
+    'сентябрь': 9, 'октябрь': 10, 'ноябрь': 11, 'декабрь': 12,
+}
+
+
+def parse_video_date(year, month, day):
+    number = MONTHS.get((month or '').strip().lower())
+    if number is None:
+        return None
+    try:
+        return datetime.date(int(year), number, int(day or 1))
+    except (TypeError, ValueError):
+        return None
+
+
+def fill_published_on(apps, schema_editor):
+    Video = apps.get_model('seneca', 'Video')
+    videos = list(Video.objects.only('year', 'month', 'date'))
+    for video in videos:
+        video.published_on = parse_video_date(video.year, video.month, video.date)
+    Video.objects.bulk_update(videos, ['published_on'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seneca', '0014_idempotencykey'),
+        ('sites', '0002_alter_domain_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='video',
+            name='published_on',
+            field=models.DateField(blank=True, editable=False, null=True, verbose_name='Дата публикации'),
+        ),
+        migrations.AddIndex(
+            model_name='video',
+            index=models.Index(fields=['site', 'published_on'], name='seneca_video_site_pub_idx'),
+        ),
+        migrations.RunPython(fill_published_on, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.1 on 2026-10-18 16:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seneca', '0015_video_published_on'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='video',
+            name='oembed_fetched_at',
+            field=models.DateTimeField(blank=True, db_index=True, editable=False, null=True, verbose_name='oEmbed обновлён'),
+        ),
+        migrations.AddField(
+            model_name='video',
+            name='oembed_thumbnail_height',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='video',
+            name='oembed_thumbnail_url',
+            field=models.URLField(blank=True, editable=False, verbose_name='Превью (oEmbed)'),
+        ),
+        migrations.AddField(
+            model_name='video',
+            name='oembed_thumbnail_width',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='video',
+            name='oembed_title',
+            field=models.CharField(blank=True, editable=False, max_length=300, verbose_name='Название (oEmbed)'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.1 on 2026-10-18 16:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seneca', '0016_video_oembed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LinkCheckResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url_hash', models.CharField(max_length=64, unique=True, verbose_name='Хеш ссылки')),
+                ('url', models.TextField(verbose_name='Ссылка')),
+                ('status_code', models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='HTTP-статус')),
+                ('error', models.CharField(blank=True, max_length=500, verbose_name='Ошибка')),
+                ('ok', models.BooleanField(default=False, verbose_name='Доступна')),
+                ('latency_ms', models.PositiveIntegerField(blank=True, null=True, verbose_name='Время ответа, мс')),
+                ('checked_at', models.DateTimeField(db_index=True, verbose_name='Проверена')),
+            ],
+            options={
+                'verbose_name': 'Проверка ссылки',
+                'verbose_name_plural': 'Проверки ссылок',
+            },
+        ),
+    ]
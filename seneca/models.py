@@ -1,39 +1,23 @@
-from django.db import models
+from django.db import models, connections, transaction, IntegrityError
+from django.db.models import (
+    F, Q, Count, Sum, DurationField, ExpressionWrapper, OuterRef, Subquery,
+)
+from django.db.models.functions import Coalesce, ExtractMonth, ExtractYear, TruncDate
+from django.db.models.expressions import RawSQL
 from django.urls import reverse
-from django.template import Template, Context
+from django.utils import timezone
 from django.core.files.base import ContentFile
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.units import mm
-from reportlab.pdfgen import canvas
-from django.utils.html import strip_tags
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
+from django.core.cache import cache
+from django.core.mail import EmailMessage
 from django.conf import settings
-import os, io, html
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+import datetime, hashlib, multiprocessing, os, re, time
 
 
-from reportlab.platypus import (
-    SimpleDocTemplate,
-    Paragraph,
-    Spacer,
-    Table,
-    TableStyle,
-    Image,
-)
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib import colors
 from django.contrib.sites.models import Site
 
 
-FONT_PATH = os.path.join(
-    settings.BASE_DIR,
-    'seneca',
-    'fonts',
-    'DejaVuSans.ttf'
-)
-pdfmetrics.registerFont(TTFont('DejaVuSans', FONT_PATH))
-
-
 class SiteAware(models.Model):
     site = models.ForeignKey(
         Site,
@@ -69,16 +53,171 @@ class Photo(SiteAware):
     def __str__(self):
         return self.caption or "Фото без подписи"
 
+MONTH_ORDER = {
+    'Январь': 1, 'Февраль': 2, 'Март': 3, 'Апрель': 4,
+    'Май': 5, 'Июнь': 6, 'Июль': 7, 'Август': 8,
+    'Сентябрь': 9, 'Октябрь': 10, 'Ноябрь': 11, 'Декабрь': 12,
+}
+MONTH_NAMES = {number: name for name, number in MONTH_ORDER.items()}
+_MONTH_BY_LOWER = {name.lower(): number for name, number in MONTH_ORDER.items()}
+
+
+def month_number(name):
+    """Номер месяца по русскому названию (без учёта регистра) или None."""
+    return _MONTH_BY_LOWER.get((name or '').strip().lower())
+
+
+def parse_video_date(year, month, day):
+    """
+    Дата публикации из строковых полей видео: год, русское название месяца,
+    число (пустое — первое число месяца). None, если строки не разбираются.
+    """
+    number = month_number(month)
+    if number is None:
+        return None
+    try:
+        return datetime.date(int(year), number, int(day or 1))
+    except (TypeError, ValueError):
+        return None
+
+
 class Video(SiteAware):
     youtube_link = models.URLField()
     description = models.TextField(blank=True)
     year = models.CharField(max_length=4)
     month = models.CharField(max_length=20)
     date = models.CharField(max_length=2)
+    # вычисляется из year/month/date в save(); по нему фильтры и сортировка
+    published_on = models.DateField('Дата публикации', null=True, blank=True, editable=False)
+    # метаданные oEmbed YouTube, заполняет refresh_video_oembed (seneca.oembed)
+    oembed_title            = models.CharField('Название (oEmbed)', max_length=300,
+                                               blank=True, editable=False)
+    oembed_thumbnail_url    = models.URLField('Превью (oEmbed)', blank=True, editable=False)
+    oembed_thumbnail_width  = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    oembed_thumbnail_height = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    oembed_fetched_at       = models.DateTimeField('oEmbed обновлён', null=True, blank=True,
+                                                   editable=False, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['site', 'published_on'], name='seneca_video_site_pub_idx'),
+        ]
 
     def __str__(self):
         return self.youtube_link
 
+    def save(self, *args, **kwargs):
+        self.published_on = parse_video_date(self.year, self.month, self.date)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'year', 'month', 'date'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'published_on'}
+        super().save(*args, **kwargs)
+
+    ARCHIVE_CACHE_KEY = 'video-archive:{site_id}'
+    # страховка на случай изменений мимо сигналов (QuerySet.update и т.п.)
+    ARCHIVE_CACHE_TIMEOUT = 60 * 60 * 24
+
+    @classmethod
+    def archive_tree(cls, site):
+        """
+        Дерево архива «год → месяц → количество» для сайта: один GROUP BY
+        по индексу (site, published_on), результат кешируется до изменения
+        видео этого сайта.
+        """
+        key = cls.ARCHIVE_CACHE_KEY.format(site_id=site.pk)
+        tree = cache.get(key)
+        if tree is not None:
+            return tree
+
+        rows = (
+            cls.objects.filter(site=site, published_on__isnull=False)
+               .annotate(y=ExtractYear('published_on'), m=ExtractMonth('published_on'))
+               .values('y', 'm')
+               .annotate(count=Count('id'))
+               .order_by('-y', '-m')
+        )
+        tree = []
+        for row in rows:
+            if not tree or tree[-1]['year'] != str(row['y']):
+                tree.append({'year': str(row['y']), 'count': 0, 'months': []})
+            tree[-1]['count'] += row['count']
+            tree[-1]['months'].append({
+                'month':  MONTH_NAMES[row['m']],
+                'number': row['m'],
+                'count':  row['count'],
+            })
+        cache.set(key, tree, cls.ARCHIVE_CACHE_TIMEOUT)
+        return tree
+
+    @classmethod
+    def invalidate_archive(cls, site_id):
+        key = cls.ARCHIVE_CACHE_KEY.format(site_id=site_id)
+        # после коммита, чтобы параллельный запрос не закешировал старое дерево
+        transaction.on_commit(lambda: cache.delete(key))
+
+def normalize_phone(phone):
+    """Только цифры; казахстанский/российский префикс 8 приводится к 7."""
+    digits = re.sub(r'\D', '', phone or '')
+    if len(digits) == 11 and digits.startswith('8'):
+        digits = '7' + digits[1:]
+    return digits
+
+
+# FTS5-индекс заявок (trigram) — создаётся миграцией только на SQLite
+APPLICATION_FTS_TABLE = 'seneca_application_fts'
+_PHONE_QUERY = re.compile(r'[\d\s()+\-]+')
+
+
+class ApplicationQuerySet(models.QuerySet):
+
+    def _term_condition(self, term):
+        digits = normalize_phone(term)
+        if connections[self.db].vendor == 'sqlite' and len(term) >= 3:
+            # trigram-токенайзер ищет подстроку по индексу, но не короче 3 символов
+            match = f'name:"{term.replace(chr(34), chr(34) * 2)}"'
+            if len(digits) >= 3:
+                match = f'({match}) OR phone_digits:"{digits}"'
+            return Q(pk__in=RawSQL(
+                f'SELECT rowid FROM {APPLICATION_FTS_TABLE} '
+                f'WHERE {APPLICATION_FTS_TABLE} MATCH %s',
+                [match],
+            ))
+
+        condition = Q(name__icontains=term)
+        if digits:
+            condition |= Q(phone_digits__contains=digits)
+        return condition
+
+    def with_closed_at(self):
+        """
+        Аннотирует closed_at_ts — время последнего перехода в «Закрыта» по
+        журналу статусов (индекс application, at); для заявок без журнала —
+        updated_at. Имя не closed_at, чтобы не заслонять метод Application.closed_at().
+        """
+        closing = (
+            ApplicationStatusTransition.objects
+                .filter(application=OuterRef('pk'), to_status=Application.STATUS_CLOSED)
+                .order_by('-at')
+                .values('at')[:1]
+        )
+        return self.annotate(closed_at_ts=Coalesce(Subquery(closing), F('updated_at')))
+
+    def search(self, query):
+        """
+        Поиск по имени и телефону. Телефон сравнивается по нормализованным
+        цифрам, поэтому «+7 (700) 123» и «8700123» находят одну заявку.
+        """
+        query = (query or '').strip()
+        if not query:
+            return self
+        # запрос из одних цифр и разделителей — это один номер, а не несколько слов
+        terms = [query] if _PHONE_QUERY.fullmatch(query) else query.split()
+        condition = Q()
+        for term in terms:
+            condition &= self._term_condition(term)
+        return self.filter(condition)
+
+
 class Application(models.Model):
     STATUS_NEW      = 'new'
     STATUS_IN_WORK  = 'in_work'
@@ -91,6 +230,9 @@ class Application(models.Model):
 
     name       = models.CharField('Имя', max_length=100)
     phone      = models.CharField('Телефон', max_length=20)
+    phone_digits = models.CharField('Телефон (цифры)', max_length=20,
+                                    blank=True, editable=False,
+                                    db_index=True)
     status     = models.CharField('Статус', max_length=10,
                                   choices=STATUS_CHOICES,
                                   default=STATUS_NEW)
@@ -101,12 +243,192 @@ class Application(models.Model):
     updated_at = models.DateTimeField('Дата обновления',
                                       auto_now=True)
 
+    objects = ApplicationQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # ключ курсорной пагинации API: ORDER BY created_at DESC, id DESC
+            models.Index(fields=['created_at', 'id'], name='seneca_app_created_id_idx'),
+        ]
+
     def __str__(self):
         return f'{self.name} — {self.phone}'
 
+    def save(self, *args, **kwargs):
+        self.phone_digits = normalize_phone(self.phone)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'phone' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'phone_digits'}
+        super().save(*args, **kwargs)
+
     def get_absolute_url(self):
         return reverse('thanks')
 
+    def closed_at(self):
+        if self.status != self.STATUS_CLOSED:
+            return None
+        if hasattr(self, 'closed_at_ts'):  # уже посчитано в with_closed_at()
+            return self.closed_at_ts
+        at = (
+            self.transitions.filter(to_status=self.STATUS_CLOSED)
+                            .order_by('-at')
+                            .values_list('at', flat=True)
+                            .first()
+        )
+        return at or self.updated_at
+
+    def time_in_status(self, until=None):
+        """Сколько секунд заявка провела в каждом статусе, по журналу переходов."""
+        until = until or timezone.now()
+        durations = {}
+        transitions = list(self.transitions.order_by('at', 'id').values_list('to_status', 'at'))
+        for (status, start), (_, end) in zip(transitions, transitions[1:] + [(None, until)]):
+            durations[status] = durations.get(status, 0) + (end - start).total_seconds()
+        return durations
+
+
+
+class ApplicationStatusTransition(models.Model):
+    """Журнал смены статусов заявок. Только добавление записей."""
+    application = models.ForeignKey(
+        Application,
+        on_delete=models.CASCADE,
+        related_name='transitions',
+        db_index=False,  # покрыт составным индексом (application, at)
+    )
+    from_status = models.CharField(max_length=10, blank=True,
+                                   choices=Application.STATUS_CHOICES)
+    to_status   = models.CharField(max_length=10,
+                                   choices=Application.STATUS_CHOICES)
+    at          = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name        = "Смена статуса заявки"
+        verbose_name_plural = "Журнал статусов заявок"
+        indexes = [
+            models.Index(fields=['application', 'at'], name='seneca_transition_app_at_idx'),
+        ]
+
+    def __str__(self):
+        return f'#{self.application_id}: {self.from_status or "—"} → {self.to_status}'
+
+    @classmethod
+    def record_created(cls, applications):
+        """Начальные записи журнала для заявок из bulk_create."""
+        cls.objects.bulk_create(
+            [cls(application=a, to_status=a.status, at=a.created_at) for a in applications],
+            batch_size=500,
+        )
+
+
+class ArchivedApplication(models.Model):
+    """
+    Архив закрытых заявок: те же поля, что у Application, плюс момент
+    закрытия. id сохраняется исходный. Строки переносит archive().
+    """
+    id           = models.BigIntegerField(primary_key=True)
+    name         = models.CharField('Имя', max_length=100)
+    phone        = models.CharField('Телефон', max_length=20)
+    phone_digits = models.CharField('Телефон (цифры)', max_length=20,
+                                    blank=True, db_index=True)
+    status       = models.CharField('Статус', max_length=10,
+                                    choices=Application.STATUS_CHOICES)
+    comment      = models.TextField('Комментарий менеджера', blank=True)
+    created_at   = models.DateTimeField('Дата создания', db_index=True)
+    updated_at   = models.DateTimeField('Дата обновления')
+    closed_at    = models.DateTimeField('Дата закрытия')
+    archived_at  = models.DateTimeField('Дата архивации', auto_now_add=True)
+
+    class Meta:
+        verbose_name        = "Архивная заявка"
+        verbose_name_plural = "Архив заявок"
+        ordering            = ['-created_at']
+
+    def __str__(self):
+        return f'{self.name} — {self.phone}'
+
+    @classmethod
+    def archive(cls, queryset=None, older_than_days=None, batch_size=500):
+        """
+        Переносит закрытые заявки, закрытые раньше чем older_than_days дней
+        назад, в архив пачками: bulk_create в архив и удаление из рабочей
+        таблицы в одной транзакции. Заявки, на которые ссылаются
+        коммерческие предложения, остаются на месте. Возвращает число
+        перенесённых заявок.
+        """
+        if older_than_days is None:
+            older_than_days = settings.APPLICATION_ARCHIVE_DAYS
+        cutoff = timezone.now() - datetime.timedelta(days=older_than_days)
+        if queryset is None:
+            queryset = Application.objects.all()
+        candidates = (
+            queryset.filter(status=Application.STATUS_CLOSED, proposal__isnull=True)
+                    .with_closed_at()
+                    .filter(closed_at_ts__lt=cutoff)
+                    .order_by('pk')
+                    .values('id', 'name', 'phone', 'phone_digits', 'status',
+                            'comment', 'created_at', 'updated_at', closed_at=F('closed_at_ts'))
+        )
+
+        moved = 0
+        while True:
+            rows = list(candidates[:batch_size])
+            if not rows:
+                return moved
+            ids = [row['id'] for row in rows]
+            with transaction.atomic():
+                cls.objects.bulk_create([cls(**row) for row in rows])
+                # вклад пачки в дневную сводку вычитаем сразу, сгруппировав по дням
+                ApplicationDailyStats.discount(
+                    (row['status'], row['created_at'], row['closed_at']) for row in rows
+                )
+                ApplicationStatusTransition.objects.filter(application_id__in=ids).delete()
+                # удаляем прямым DELETE: QuerySet.delete() при подписанном pre_delete
+                # загрузил бы каждую заявку и вычел бы её из сводки второй раз;
+                # журнал переходов уже удалён, предложения на эти заявки не ссылаются
+                with connections[Application.objects.db].cursor() as cursor:
+                    qn = cursor.db.ops.quote_name
+                    cursor.execute(
+                        f'DELETE FROM {qn(Application._meta.db_table)} '
+                        f'WHERE {qn(Application._meta.pk.column)} IN ({", ".join(["%s"] * len(ids))})',
+                        ids,
+                    )
+            moved += len(rows)
+
+
+class IdempotencyKey(models.Model):
+    """
+    Ответ на POST с заголовком Idempotency-Key. Повтор запроса с тем же
+    ключом в течение IDEMPOTENCY_KEY_TTL_HOURS получает сохранённый ответ,
+    а не создаёт заявку ещё раз. Старые ключи удаляет purge_idempotency_keys.
+    """
+    key          = models.CharField('Ключ', max_length=255, unique=True)
+    request_hash = models.CharField('Хеш тела запроса', max_length=64)
+    status_code  = models.PositiveSmallIntegerField('HTTP-статус', null=True)
+    response     = models.JSONField('Ответ', null=True)
+    created_at   = models.DateTimeField('Дата создания', default=timezone.now, db_index=True)
+
+    class Meta:
+        verbose_name        = "Ключ идемпотентности"
+        verbose_name_plural = "Ключи идемпотентности"
+
+    def __str__(self):
+        return self.key
+
+    @staticmethod
+    def expiry_cutoff():
+        return timezone.now() - datetime.timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS)
+
+    @classmethod
+    def lookup(cls, key):
+        """Действующая (не просроченная) запись по ключу или None."""
+        return cls.objects.filter(key=key, created_at__gte=cls.expiry_cutoff()).first()
+
+    @classmethod
+    def purge(cls):
+        """Удаляет просроченные ключи; возвращает их число."""
+        deleted, _ = cls.objects.filter(created_at__lt=cls.expiry_cutoff()).delete()
+        return deleted
 
 
 class Block(SiteAware):
@@ -151,9 +473,16 @@ class Plan(SiteAware):
 class ProposalTemplate(models.Model):
     name = models.CharField("Название шаблона", max_length=200)
     content = models.TextField(
-        "Текстовый шаблон (plain-text, с {placeholders})"
+        "Текстовый шаблон (plain-text, с {placeholders})",
+        help_text=(
+            "Доступно: {created_at}, {block_name}, {floor}, {finish_level}, {area}, "
+            "{price_per_m2}, {total_price}, {client_name}, {client_phone}. "
+            "Абзац из одного {price_table} или {client_section} заменяется "
+            "таблицей цен или контактами клиента."
+        ),
     )
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         verbose_name        = "Шаблон предложения"
@@ -196,6 +525,7 @@ class Proposal(models.Model):
         "Итоговая стоимость", max_digits=12, decimal_places=2, default=0
     )
     pdf_file     = models.FileField("PDF-документ", upload_to='proposals/', blank=True)
+    pdf_fingerprint = models.CharField(max_length=64, blank=True, editable=False)
     created_at   = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -206,118 +536,514 @@ class Proposal(models.Model):
         return f"Предложение #{self.pk} — {self.block.name}, {self.floor.get_level_display()}"
 
     def save(self, *args, **kwargs):
-        plan = self.floor.plan
-        self.price_per_m2 = getattr(plan, 'price_per_m2', 0)
+        # одна выборка цены вместо загрузки этажа и плана
+        price = (
+            Plan.objects.filter(floor_id=self.floor_id)
+                        .values_list('price_per_m2', flat=True)
+                        .first()
+        )
+        self.price_per_m2 = price if price is not None else 0
         self.total_price  = self.price_per_m2 * self.area
         super().save(*args, **kwargs)
 
-    def generate_pdf(self):
-        # 1) Контекст
-        ctx = {
+    @classmethod
+    def reprice(cls, plans=None, regenerate_pdf=False, batch_size=500):
+        """
+        Пересчитывает цену за м² и итоговую стоимость предложений по текущим
+        ценам планировок (всех или только plans) пачками bulk_update.
+        При regenerate_pdf ставит изменённые предложения в очередь на PDF.
+        Возвращает число изменённых предложений.
+        """
+        qs = cls.objects.filter(floor__plan__isnull=False)
+        if plans is not None:
+            qs = qs.filter(floor__plan__in=plans)
+        qs = (
+            qs.annotate(plan_price=F('floor__plan__price_per_m2'))
+              .order_by('id')
+              .values_list('id', 'area', 'price_per_m2', 'total_price', 'plan_price')
+        )
+
+        # страницы по диапазонам id: каждая читается целиком до записи, потому что
+        # SQLite не изолирует открытый курсор от UPDATE той же таблицы в том же соединении
+        changed_ids = []
+        last_id = 0
+        while True:
+            page = list(qs.filter(id__gt=last_id)[:batch_size])
+            if not page:
+                break
+            last_id = page[-1][0]
+            changed = []
+            for pk, area, price_per_m2, total_price, plan_price in page:
+                total = (plan_price * area).quantize(Decimal('0.01'))
+                if price_per_m2 == plan_price and total_price == total:
+                    continue
+                changed.append(cls(pk=pk, price_per_m2=plan_price, total_price=total))
+            if changed:
+                cls.objects.bulk_update(changed, ['price_per_m2', 'total_price'])
+                changed_ids += [p.pk for p in changed]
+
+        if regenerate_pdf and changed_ids:
+            ProposalPDFJob.enqueue_many(changed_ids)
+        return len(changed_ids)
+
+    def pdf_context(self):
+        return {
+            'template_id':         self.template_id,
+            'template_updated_at': self.template.updated_at.isoformat(),
+            'template_content':    self.template.content,
             'created_at':   self.created_at.strftime('%d.%m.%Y'),
             'block_name':   self.block.name,
             'floor':        self.floor.get_level_display(),
-            'area':         self.area,
-            'price_per_m2': self.price_per_m2,
-            'total_price':  self.total_price,
+            'finish_level': self.get_finish_level_display(),
+            # суммы форматируем сразу: Decimal('50') и Decimal('50.00') дают один PDF
+            'area':         f"{Decimal(self.area):.2f}",
+            'price_per_m2': f"{Decimal(self.price_per_m2):.2f}",
+            'total_price':  f"{Decimal(self.total_price):.2f}",
             'client_section': (
                 f"Контактные данные клиента:\n"
                 f"Имя: {self.application.name}\n"
                 f"Телефон: {self.application.phone}"
-            ) if self.application else ''
+            ) if self.application else '',
+            'client_name':  self.application.name if self.application else '',
+            'client_phone': self.application.phone if self.application else '',
         }
 
-        logo_path      = os.path.join(settings.BASE_DIR, '../static', '../static', 'images', 'logo.png')
-        brand_primary   = colors.HexColor('#052920')
-        brand_secondary = colors.HexColor('#AF9578')
+    def pdf_is_current(self, fingerprint):
+        return bool(self.pdf_file) and self.pdf_fingerprint == fingerprint
+
+    def _store_pdf(self, pdf, fingerprint):
+        if self.pdf_file:
+            # перезаписываем тот же файл, а не плодим proposal_<pk>_<suffix>.pdf
+            self.pdf_file.delete(save=False)
+        self.pdf_file.save(f'proposal_{self.pk}.pdf', ContentFile(pdf), save=False)
+        self.pdf_fingerprint = fingerprint
+
+    def generate_pdf(self, force=False):
+        """
+        Рендерит и сохраняет PDF. Если входные данные не изменились
+        с прошлой генерации, ничего не делает и возвращает False.
+        """
+        from .pdf import proposal_pdf_fingerprint, render_proposal_pdf
+
+        ctx = self.pdf_context()
+        fingerprint = proposal_pdf_fingerprint(ctx)
+        if not force and self.pdf_is_current(fingerprint):
+            return False
+
+        self._store_pdf(render_proposal_pdf(ctx), fingerprint)
+        super().save(update_fields=['pdf_file', 'pdf_fingerprint'])
+        return True
+
+    @classmethod
+    def generate_pdfs(cls, proposals, max_workers=None, force=False):
+        """
+        Массовая генерация PDF: рендер распределяется по пулу процессов
+        (по числу ядер), файлы записываются одним bulk_update.
+        Предложения с актуальным PDF пропускаются. Ошибка рендера одного
+        предложения не отменяет остальные. Возвращает (число
+        перегенерированных файлов, [(предложение, текст ошибки), ...]).
+        """
+        from .pdf import proposal_pdf_fingerprint, render_proposal_pdf
+
+        pending = []
+        for proposal in proposals.select_related('template', 'block', 'floor', 'application'):
+            ctx = proposal.pdf_context()
+            fingerprint = proposal_pdf_fingerprint(ctx)
+            if force or not proposal.pdf_is_current(fingerprint):
+                pending.append((proposal, ctx, fingerprint))
+        if not pending:
+            return 0, []
+
+        contexts = [ctx for _, ctx, _ in pending]
+        workers = min(max_workers or os.cpu_count() or 1, len(contexts))
+        if workers > 1:
+            # spawn: воркеры стартуют с чистого интерпретатора и не наследуют
+            # соединения с БД, поэтому соединения и транзакцию вызывающего не трогаем
+            with ProcessPoolExecutor(max_workers=workers,
+                                     mp_context=multiprocessing.get_context('spawn')) as pool:
+                futures = [pool.submit(render_proposal_pdf, ctx) for ctx in contexts]
+                renders = [future.exception() or future.result() for future in futures]
+        else:
+            renders = []
+            for ctx in contexts:
+                try:
+                    renders.append(render_proposal_pdf(ctx))
+                except Exception as e:
+                    renders.append(e)
+
+        rendered, failed = [], []
+        for (proposal, _, fingerprint), pdf in zip(pending, renders):
+            if isinstance(pdf, BaseException):
+                failed.append((proposal, str(pdf) or type(pdf).__name__))
+                continue
+            proposal._store_pdf(pdf, fingerprint)
+            rendered.append(proposal)
+        cls.objects.bulk_update(rendered, ['pdf_file', 'pdf_fingerprint'], batch_size=500)
+        return len(rendered), failed
+
+
+class ProposalPDFJob(models.Model):
+    STATUS_QUEUED  = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE    = 'done'
+    STATUS_FAILED  = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED,  'В очереди'),
+        (STATUS_RUNNING, 'Выполняется'),
+        (STATUS_DONE,    'Готово'),
+        (STATUS_FAILED,  'Ошибка'),
+    ]
+
+    proposal    = models.ForeignKey(
+        Proposal,
+        verbose_name="Предложение",
+        on_delete=models.CASCADE,
+        related_name='pdf_jobs'
+    )
+    status      = models.CharField("Статус", max_length=10,
+                                   choices=STATUS_CHOICES,
+                                   default=STATUS_QUEUED,
+                                   db_index=True)
+    error       = models.TextField("Ошибка", blank=True)
+    created_at  = models.DateTimeField(auto_now_add=True)
+    started_at  = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name        = "Задача генерации PDF"
+        verbose_name_plural = "Задачи генерации PDF"
+        ordering            = ['created_at', 'id']
+
+    def __str__(self):
+        return f"PDF для предложения #{self.proposal_id} — {self.get_status_display()}"
+
+    @classmethod
+    def enqueue(cls, proposal):
+        """Ставит генерацию в очередь, если для предложения ещё нет ожидающей задачи."""
+        job = cls.objects.filter(proposal=proposal, status=cls.STATUS_QUEUED).first()
+        return job or cls.objects.create(proposal=proposal)
+
+    @classmethod
+    def enqueue_many(cls, proposal_ids):
+        """Массовый вариант enqueue: одна выборка и один bulk_create."""
+        queued = set(
+            cls.objects.filter(proposal_id__in=proposal_ids, status=cls.STATUS_QUEUED)
+                       .values_list('proposal_id', flat=True)
+        )
+        jobs = [cls(proposal_id=pk) for pk in proposal_ids if pk not in queued]
+        cls.objects.bulk_create(jobs, batch_size=500)
+        return len(jobs)
+
+    @classmethod
+    def claim_next(cls):
+        """
+        Забирает самую старую задачу из очереди. Переход queued → running
+        делается условным UPDATE, поэтому несколько воркеров не возьмут
+        одну и ту же задачу.
+        """
+        while True:
+            job = cls.objects.filter(status=cls.STATUS_QUEUED).first()
+            if job is None:
+                return None
+            started_at = timezone.now()
+            claimed = cls.objects.filter(pk=job.pk, status=cls.STATUS_QUEUED).update(
+                status=cls.STATUS_RUNNING, started_at=started_at
+            )
+            if claimed:
+                job.status = cls.STATUS_RUNNING
+                job.started_at = started_at
+                return job
+
+    def run(self):
+        try:
+            self.proposal.generate_pdf()
+        except Exception as e:
+            self.status = self.STATUS_FAILED
+            self.error = str(e)
+        else:
+            self.status = self.STATUS_DONE
+            self.error = ''
+        self.finished_at = timezone.now()
+        self.save(update_fields=['status', 'error', 'finished_at'])
+
+
+class AdminNotification(models.Model):
+    """
+    Исходящее письмо администраторам (outbox). Пишется в той же транзакции,
+    что и заявка, а отправляется воркером send_admin_notifications.
+    """
+    subject    = models.CharField("Тема", max_length=255)
+    message    = models.TextField("Текст")
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at    = models.DateTimeField(null=True, blank=True, db_index=True)
+    attempts   = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        verbose_name        = "Уведомление администратора"
+        verbose_name_plural = "Уведомления администраторов"
+        ordering            = ['id']
+
+    # после стольких неудачных попыток уведомление откладывается и больше не отправляется
+    MAX_ATTEMPTS = 5
+
+    def __str__(self):
+        return self.subject
+
+    @staticmethod
+    def _subject(text):
+        # имя из публичного API может содержать перевод строки, а с ним EmailMessage
+        # бросает BadHeaderError
+        return ' '.join(text.splitlines())
+
+    @classmethod
+    def pending(cls):
+        return cls.objects.filter(sent_at__isnull=True, attempts__lt=cls.MAX_ATTEMPTS)
+
+    @staticmethod
+    def _describe(application):
+        return (
+            f'ID:    {application.id}\n'
+            f'Имя:   {application.name}\n'
+            f'Телефон: {application.phone}\n'
+            f'Дата:  {application.created_at.strftime("%Y-%m-%d %H:%M")}\n'
+        )
 
-        buffer = io.BytesIO()
-        doc = SimpleDocTemplate(
-            buffer,
-            pagesize=A4,
-            leftMargin=20*mm, rightMargin=20*mm,
-            topMargin=20*mm, bottomMargin=20*mm
+    @classmethod
+    def for_application(cls, application):
+        return cls.objects.create(
+            subject=cls._subject(f'Новая заявка от {application.name}'),
+            message=f'Поступила новая заявка:\n\n{cls._describe(application)}',
         )
 
-        styles = getSampleStyleSheet()
-        styles.add(ParagraphStyle(
-            name='ProposalTitle',
-            parent=styles['Heading1'],
-            fontName='DejaVuSans',
-            fontSize=18,
-            leading=22,
-            alignment=1,  # по центру
-            textColor=colors.white,
-            backColor=brand_primary,
-            spaceAfter=6*mm,
-        ))
-        normal = ParagraphStyle(
-            'NormalBrand',
-            parent=styles['Normal'],
-            fontName='DejaVuSans',
-            fontSize=11,
-            leading=14,
-            textColor=colors.black,
+    @classmethod
+    def for_applications(cls, applications):
+        """Одно сводное уведомление на пачку заявок вместо N писем."""
+        if len(applications) == 1:
+            return cls.for_application(applications[0])
+        return cls.objects.create(
+            subject=f'Новые заявки: {len(applications)}',
+            message=(
+                f'Поступили новые заявки ({len(applications)}):\n\n'
+                + '\n'.join(cls._describe(a) for a in applications)
+            ),
         )
-        header_style = ParagraphStyle(
-            'Header',
-            parent=normal,
-            fontName='DejaVuSans',
-            fontSize=12,
-            leading=15,
-            textColor=brand_primary,
-            spaceAfter=2*mm,
+
+    @classmethod
+    def _email(cls, subject, body):
+        return EmailMessage(
+            cls._subject(f'{settings.EMAIL_SUBJECT_PREFIX}{subject}'), body,
+            settings.SERVER_EMAIL, [address for _, address in settings.ADMINS],
         )
 
-        elements = []
+    @classmethod
+    def send_pending(cls, connection, digest=False, batch_size=100):
+        """
+        Отправляет все неотправленные уведомления через одно соединение.
+        Каждое письмо отправляется и отмечается отдельно: ошибка в одном не
+        задерживает остальные и не приводит к повторной отправке уже ушедших.
+        В режиме digest каждая пачка уходит одним письмом.
+        Возвращает (число отправленных, число неудачных) уведомлений.
+        """
+        sent = failed = 0
+        last_id = 0
+        while True:
+            # страницы по id: неудачные уведомления повторяются только в следующем проходе
+            batch = list(cls.pending().filter(pk__gt=last_id)[:batch_size])
+            if not batch:
+                return sent, failed
+            last_id = batch[-1].pk
+
+            if not settings.ADMINS:
+                groups = [(batch, None)]
+            elif digest and len(batch) > 1:
+                body = '\n\n'.join(f'{n.subject}\n{n.message}' for n in batch)
+                groups = [(batch, cls._email(f'Новые уведомления: {len(batch)}', body))]
+            else:
+                groups = [([n], cls._email(n.subject, n.message)) for n in batch]
+
+            for notifications, message in groups:
+                ids = [n.pk for n in notifications]
+                try:
+                    if message is not None:
+                        connection.send_messages([message])
+                except Exception as e:
+                    cls.objects.filter(pk__in=ids).update(
+                        attempts=F('attempts') + 1, last_error=str(e)
+                    )
+                    # сетевая ошибка или отказ SMTP-сервера касается всех писем —
+                    # прерываем проход, не расходуя попытки остальных
+                    if isinstance(e, OSError):
+                        raise
+                    failed += len(ids)
+                    continue
+                cls.objects.filter(pk__in=ids).update(
+                    sent_at=timezone.now(), attempts=F('attempts') + 1, last_error=''
+                )
+                sent += len(ids)
+
 
-        if os.path.exists(logo_path):
-            img = Image(logo_path, height=20*mm, hAlign='LEFT')
-            elements.append(img)
-        elements.append(Paragraph("Коммерческое предложение", styles['ProposalTitle']))
+class ApplicationDailyStats(models.Model):
+    """
+    Дневная сводка по заявкам (по дате создания). Поддерживается
+    инкрементально сигналами Application, пересобирается командой
+    rebuild_application_stats.
+    """
+    date               = models.DateField("Дата", unique=True)
+    new_count          = models.IntegerField("Новые", default=0)
+    in_work_count      = models.IntegerField("В работе", default=0)
+    closed_count       = models.IntegerField("Закрытые", default=0)
+    processing_seconds = models.FloatField("Время обработки закрытых, с", default=0)
+
+    class Meta:
+        verbose_name        = "Сводка заявок за день"
+        verbose_name_plural = "Сводки заявок по дням"
+        ordering            = ['date']
+
+    def __str__(self):
+        return f'{self.date}: {self.total_count}'
 
+    @property
+    def total_count(self):
+        return self.new_count + self.in_work_count + self.closed_count
 
-        elements.append(Paragraph(f"<font color='{brand_secondary.hexval()}'>Дата: {ctx['created_at']}</font>", normal))
-        elements.append(Spacer(1, 6*mm))
+    @staticmethod
+    def contribution(status, created_at, closed_at):
+        """Вклад одной заявки: (дата, статус, секунды обработки)."""
+        seconds = 0
+        if status == Application.STATUS_CLOSED:
+            seconds = (closed_at - created_at).total_seconds()
+        return timezone.localdate(created_at), status, seconds
 
-        elements.append(Paragraph("Объект:", header_style))
-        elements.append(Paragraph(f"Блок: {ctx['block_name']}, этаж: {ctx['floor']}", normal))
-        elements.append(Spacer(1, 6*mm))
+    CACHE_VERSION_KEY = 'application-stats-version'
 
-        data = [
-            ['Параметр', 'Значение'],
-            ['Площадь, м²', f"{ctx['area']}"],
-            ['Цена за м²', f"{ctx['price_per_m2']} ₸"],
-            ['Итоговая стоимость', f"{ctx['total_price']} ₸"],
+    @classmethod
+    def cache_version(cls):
+        """
+        Версия сводки для ключей кеша отчётов; меняется при каждом изменении.
+        Версия — момент изменения в наносекундах, а не счётчик: если ключ
+        версии вытеснен из кеша, новая версия не совпадёт ни с одной старой.
+        """
+        return cache.get_or_set(cls.CACHE_VERSION_KEY, time.time_ns, timeout=None)
+
+    @classmethod
+    def invalidate_cache(cls):
+        # после коммита, чтобы параллельный запрос не закешировал старые данные под новой версией
+        transaction.on_commit(
+            lambda: cache.set(cls.CACHE_VERSION_KEY, time.time_ns(), timeout=None)
+        )
+
+    @classmethod
+    def apply(cls, date, status, count=1, seconds=0):
+        """Атомарно прибавляет count заявок в статусе status к дню date."""
+        field = f'{status}_count'
+        changes = {
+            field: F(field) + count,
+            'processing_seconds': F('processing_seconds') + seconds,
+        }
+        cls.invalidate_cache()
+        if cls.objects.filter(date=date).update(**changes):
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(date=date, **{field: count, 'processing_seconds': seconds})
+        except IntegrityError:
+            # строку за этот день только что создал параллельный запрос
+            cls.objects.filter(date=date).update(**changes)
+
+    @classmethod
+    def record(cls, applications):
+        """Учитывает заявки, созданные в обход сигналов (bulk_create)."""
+        totals = {}
+        for app in applications:
+            # новая заявка, созданная сразу закрытой, закрыта в момент создания
+            date, status, seconds = cls.contribution(app.status, app.created_at, app.created_at)
+            count, secs = totals.get((date, status), (0, 0))
+            totals[(date, status)] = (count + 1, secs + seconds)
+        for (date, status), (count, seconds) in totals.items():
+            cls.apply(date, status, count, seconds)
+
+    @classmethod
+    def discount(cls, rows):
+        """
+        Вычитает заявки, удалённые в обход сигналов (архивация): rows —
+        тройки (статус, created_at, closed_at). Одно обновление на день и статус.
+        """
+        totals = {}
+        for status, created_at, closed_at in rows:
+            date, status, seconds = cls.contribution(status, created_at, closed_at)
+            count, secs = totals.get((date, status), (0, 0))
+            totals[(date, status)] = (count + 1, secs + seconds)
+        for (date, status), (count, seconds) in totals.items():
+            cls.apply(date, status, -count, -seconds)
+
+    @classmethod
+    def rebuild(cls):
+        """Полный пересчёт сводки одним GROUP BY по таблице заявок."""
+        closed = Q(status=Application.STATUS_CLOSED)
+        rows = (
+            Application.objects
+                .with_closed_at()
+                .annotate(day=TruncDate('created_at'))
+                .values('day')
+                .annotate(
+                    new=Count('id', filter=Q(status=Application.STATUS_NEW)),
+                    in_work=Count('id', filter=Q(status=Application.STATUS_IN_WORK)),
+                    closed=Count('id', filter=closed),
+                    processing=Sum(
+                        ExpressionWrapper(F('closed_at_ts') - F('created_at'),
+                                          output_field=DurationField()),
+                        filter=closed,
+                    ),
+                )
+                .order_by('day')
+        )
+        stats = [
+            cls(
+                date=row['day'],
+                new_count=row['new'],
+                in_work_count=row['in_work'],
+                closed_count=row['closed'],
+                processing_seconds=(
+                    row['processing'].total_seconds() if row['processing'] else 0
+                ),
+            )
+            for row in rows
         ]
-        table = Table(data, colWidths=[60*mm, 60*mm])
-        table.setStyle(TableStyle([
-            ('FONTNAME',    (0,0), (-1,-1), 'DejaVuSans'),
-            ('FONTSIZE',    (0,0), (-1,-1), 11),
-            ('BACKGROUND',  (0,0), (-1,0), brand_secondary),
-            ('TEXTCOLOR',   (0,0), (-1,0), colors.white),
-            ('ALIGN',       (0,0), (-1,0), 'CENTER'),
-            ('GRID',        (0,0), (-1,-1), 0.5, colors.grey),
-            ('ALIGN',       (1,1), (1,-1), 'RIGHT'),
-        ]))
-        elements.append(table)
-        elements.append(Spacer(1, 6*mm))
-
-        if ctx['client_section']:
-            elements.append(Paragraph("Контактные данные клиента:", header_style))
-            for line in ctx['client_section'].splitlines():
-                elements.append(Paragraph(line, normal))
-            elements.append(Spacer(1, 6*mm))
-
-        elements.append(Paragraph("Условия оплаты: 50% предоплата, 50% — при сдаче объекта.", normal))
-        elements.append(Paragraph("Срок сдачи: согласовывается дополнительно.", normal))
-        elements.append(Spacer(1, 6*mm))
-
-        elements.append(Paragraph("Спасибо за внимание!", normal))
-        elements.append(Paragraph("С уважением, команда Seneca Partners", normal))
-
-        doc.build(elements)
-        buffer.seek(0)
-        self.pdf_file.save(f'proposal_{self.pk}.pdf', ContentFile(buffer.read()), save=False)
-        buffer.close()
-        super().save(update_fields=['pdf_file'])
\ No newline at end of file
+        with transaction.atomic():
+            cls.objects.all().delete()
+            cls.objects.bulk_create(stats, batch_size=500)
+            cls.invalidate_cache()
+        return len(stats)
+
+
+class LinkCheckResult(models.Model):
+    """
+    Последний результат проверки внешней ссылки (seneca.linkcheck).
+    Ключ — sha256 ссылки: одинаковые ссылки из разных видео и планировок
+    проверяются и хранятся один раз.
+    """
+    url_hash    = models.CharField('Хеш ссылки', max_length=64, unique=True)
+    url         = models.TextField('Ссылка')
+    status_code = models.PositiveSmallIntegerField('HTTP-статус', null=True, blank=True)
+    error       = models.CharField('Ошибка', max_length=500, blank=True)
+    ok          = models.BooleanField('Доступна', default=False)
+    latency_ms  = models.PositiveIntegerField('Время ответа, мс', null=True, blank=True)
+    checked_at  = models.DateTimeField('Проверена', db_index=True)
+
+    class Meta:
+        verbose_name        = "Проверка ссылки"
+        verbose_name_plural = "Проверки ссылок"
+
+    def __str__(self):
+        return self.url
+
+    @staticmethod
+    def hash_url(url):
+        return hashlib.sha256(url.encode()).hexdigest()
+
+    @property
+    def status(self):
+        """HTTP-код или текст ошибки — как в отчёте проверки ссылок."""
+        return self.status_code if self.status_code is not None else self.error
+
@@ -0,0 +1,115 @@
+"""
+Метаданные YouTube oEmbed для видео: название, превью и его размеры.
+
+Хранятся в полях Video.oembed_*, чтобы API отдавал их сразу, а клиенты не
+ходили в YouTube сами. Обновляет их команда refresh_video_oembed; адрес
+сервиса — YOUTUBE_OEMBED_ENDPOINT.
+"""
+import datetime
+
+import requests
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Video
+
+# поле ответа oEmbed → поле Video
+FIELDS = {
+    'title':            'oembed_title',
+    'thumbnail_url':    'oembed_thumbnail_url',
+    'thumbnail_width':  'oembed_thumbnail_width',
+    'thumbnail_height': 'oembed_thumbnail_height',
+}
+UPDATE_FIELDS = [*FIELDS.values(), 'oembed_fetched_at']
+
+
+class OEmbedError(Exception):
+    """Сервис oEmbed не ответил или ответил ошибкой; status — HTTP-код, если был."""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+def endpoint():
+    return settings.YOUTUBE_OEMBED_ENDPOINT
+
+
+def fetch(url, session=None, timeout=None):
+    """Ответ oEmbed для ссылки на видео (dict) или OEmbedError."""
+    session = session or requests
+    try:
+        resp = session.get(
+            endpoint(),
+            params={'url': url, 'format': 'json'},
+            timeout=timeout or settings.YOUTUBE_OEMBED_TIMEOUT,
+        )
+    except requests.RequestException as e:
+        raise OEmbedError(str(e)) from e
+    if resp.status_code != 200:
+        raise OEmbedError(f'HTTP {resp.status_code}', status=resp.status_code)
+    try:
+        return resp.json()
+    except ValueError as e:
+        raise OEmbedError(f'некорректный JSON: {e}', status=resp.status_code) from e
+
+
+def apply(video, payload, fetched_at=None):
+    """Переносит ответ oEmbed в поля видео (без сохранения)."""
+    max_length = Video._meta.get_field('oembed_title').max_length
+    video.oembed_title = (payload.get('title') or '')[:max_length]
+    # обрезанный URL битый, поэтому слишком длинную ссылку на превью не сохраняем
+    thumbnail_url = payload.get('thumbnail_url') or ''
+    if len(thumbnail_url) > Video._meta.get_field('oembed_thumbnail_url').max_length:
+        thumbnail_url = ''
+    video.oembed_thumbnail_url = thumbnail_url
+    for key in ('thumbnail_width', 'thumbnail_height'):
+        value = payload.get(key)
+        setattr(video, FIELDS[key], int(value) if isinstance(value, (int, float)) else None)
+    video.oembed_fetched_at = fetched_at or timezone.now()
+
+
+def stale_videos(max_age_hours=None):
+    """Видео без метаданных или с метаданными старше VIDEO_OEMBED_TTL_HOURS."""
+    if max_age_hours is None:
+        max_age_hours = settings.VIDEO_OEMBED_TTL_HOURS
+    cutoff = timezone.now() - datetime.timedelta(hours=max_age_hours)
+    return Video.objects.filter(
+        Q(oembed_fetched_at__isnull=True) | Q(oembed_fetched_at__lt=cutoff)
+    )
+
+
+def refresh(videos, session=None):
+    """
+    Запрашивает oEmbed для каждого видео через одну HTTP-сессию и сохраняет
+    успешные ответы одним bulk_update. Возвращает (обновлено, ошибок).
+    """
+    own_session = session is None
+    session = session or requests.Session()
+    updated, failed = [], 0
+    try:
+        for video in videos:
+            try:
+                payload = fetch(video.youtube_link, session=session)
+            except OEmbedError:
+                failed += 1
+                continue
+            apply(video, payload)
+            updated.append(video)
+    finally:
+        if own_session:
+            session.close()
+    Video.objects.bulk_update(updated, UPDATE_FIELDS)
+    return len(updated), failed
+
+
+def store(payloads):
+    """Сохраняет уже полученные ответы {ссылка: payload} во все видео с этой ссылкой."""
+    now = timezone.now()
+    for url, payload in payloads.items():
+        video = Video()
+        apply(video, payload, fetched_at=now)
+        Video.objects.filter(youtube_link=url).update(
+            **{field: getattr(video, field) for field in UPDATE_FIELDS}
+        )
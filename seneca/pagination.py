@@ -0,0 +1,37 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Курсорная (keyset) пагинация: страница выбирается условием по ключу
+    сортировки, а не OFFSET, поэтому время ответа не растёт с размером
+    таблицы. Размер страницы — API_PAGE_SIZE или ?page_size=, но не больше
+    API_MAX_PAGE_SIZE.
+    """
+    page_size_query_param = 'page_size'
+
+    def get_page_size(self, request):
+        # из настроек при каждом запросе, чтобы работал override_settings
+        self.page_size = settings.API_PAGE_SIZE
+        return super().get_page_size(request)
+
+    @property
+    def max_page_size(self):
+        return settings.API_MAX_PAGE_SIZE
+
+
+class ApplicationPagination(KeysetPagination):
+    # ключ (created_at, id) покрыт составным индексом заявок
+    ordering = ('-created_at', '-id')
+
+
+class CatalogPagination(KeysetPagination):
+    # выборки каталога всегда отфильтрованы по site, так что порядок по id
+    # совпадает с (site, id) и идёт по индексу site_id (в SQLite он включает rowid)
+    ordering = ('id',)
+
+
+class BankPagination(KeysetPagination):
+    # курсор строится по name — оно уникально и проиндексировано; id — для устойчивости
+    ordering = ('name', 'id')
@@ -0,0 +1,389 @@
+"""
+Рендер PDF коммерческих предложений на ReportLab.
+
+Модуль импортируется лениво — только при генерации PDF, — чтобы команды
+manage.py, тесты и воркеры не платили за импорт ReportLab и разбор шрифта.
+"""
+from django.conf import settings
+from django.utils.html import strip_tags
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import mm
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from html.parser import HTMLParser
+from string import Formatter
+import os, io, html, functools, hashlib, json
+
+
+from reportlab.platypus import (
+    SimpleDocTemplate,
+    Paragraph,
+    Spacer,
+    Table,
+    TableStyle,
+    Flowable,
+)
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib import colors
+from reportlab import rl_config
+
+# без ASCII85 поверх zlib: чистопитоновое кодирование было основной ценой
+# логотипа в каждом рендере, а бинарные потоки ещё и короче
+rl_config.useA85 = 0
+
+
+FONT_PATH = os.path.join(
+    settings.BASE_DIR,
+    'seneca',
+    'fonts',
+    'DejaVuSans.ttf'
+)
+LOGO_PATH = os.path.join(settings.BASE_DIR, 'static', 'images', 'logo.png')
+LOGO_HEIGHT = 20*mm
+
+# увеличивать при изменении вёрстки PDF, чтобы старые отпечатки стали недействительны
+PDF_LAYOUT_VERSION = 2
+
+
+@functools.cache
+def get_pdf_render_context():
+    """
+    Стили, цвета, стиль таблицы и декодированный логотип для PDF.
+    Собираются один раз на процесс и переиспользуются всеми рендерами.
+    """
+    pdfmetrics.registerFont(TTFont('DejaVuSans', FONT_PATH))
+
+    brand_primary   = colors.HexColor('#052920')
+    brand_secondary = colors.HexColor('#AF9578')
+
+    styles = getSampleStyleSheet()
+    styles.add(ParagraphStyle(
+        name='ProposalTitle',
+        parent=styles['Heading1'],
+        fontName='DejaVuSans',
+        fontSize=18,
+        leading=22,
+        alignment=1,  # по центру
+        textColor=colors.white,
+        backColor=brand_primary,
+        spaceAfter=6*mm,
+    ))
+    normal = ParagraphStyle(
+        'NormalBrand',
+        parent=styles['Normal'],
+        fontName='DejaVuSans',
+        fontSize=11,
+        leading=14,
+        textColor=colors.black,
+    )
+    header_style = ParagraphStyle(
+        'Header',
+        parent=normal,
+        fontName='DejaVuSans',
+        fontSize=12,
+        leading=15,
+        textColor=brand_primary,
+        spaceAfter=2*mm,
+    )
+
+    table_style = TableStyle([
+        ('FONTNAME',    (0,0), (-1,-1), 'DejaVuSans'),
+        ('FONTSIZE',    (0,0), (-1,-1), 11),
+        ('BACKGROUND',  (0,0), (-1,0), brand_secondary),
+        ('TEXTCOLOR',   (0,0), (-1,0), colors.white),
+        ('ALIGN',       (0,0), (-1,0), 'CENTER'),
+        ('GRID',        (0,0), (-1,-1), 0.5, colors.grey),
+        ('ALIGN',       (1,1), (1,-1), 'RIGHT'),
+    ])
+
+    logo = None
+    logo_width = None
+    if os.path.exists(LOGO_PATH):
+        logo = ImageReader(LOGO_PATH)
+        logo.getRGBData()  # декодируем сразу, а не при первом рендере
+        width, height = logo.getSize()
+        logo_width = LOGO_HEIGHT * width / height
+
+    return {
+        'brand_primary':   brand_primary,
+        'brand_secondary': brand_secondary,
+        'title':           styles['ProposalTitle'],
+        'normal':          normal,
+        'header':          header_style,
+        'table_style':     table_style,
+        'logo':            logo,
+        'logo_width':      logo_width,
+    }
+
+
+class _LogoFlowable(Flowable):
+    """Логотип из уже декодированного ImageReader (см. get_pdf_render_context)."""
+
+    def __init__(self, image, width, height, hAlign='LEFT'):
+        super().__init__()
+        self.image = image
+        self.width = width
+        self.height = height
+        self.hAlign = hAlign
+
+    def wrap(self, availWidth, availHeight):
+        return self.width, self.height
+
+    def draw(self):
+        self.canv.drawImage(self.image, 0, 0, self.width, self.height, mask='auto')
+
+
+# HTML-теги CKEditor, которые начинают новый абзац, и стиль абзаца для каждого
+_BLOCK_TAGS = {
+    'p': 'normal', 'div': 'normal', 'blockquote': 'normal', 'li': 'normal',
+    'h1': 'header', 'h2': 'header', 'h3': 'header',
+    'h4': 'header', 'h5': 'header', 'h6': 'header',
+}
+# инлайн-теги, которые Paragraph из ReportLab понимает сам
+_INLINE_TAGS = {
+    'b': 'b', 'strong': 'b', 'i': 'i', 'em': 'i', 'u': 'u',
+    's': 'strike', 'strike': 'strike', 'sub': 'sub', 'sup': 'super',
+}
+# абзацы, целиком состоящие из этих плейсхолдеров, заменяются готовыми блоками
+_BLOCK_PLACEHOLDERS = {'{price_table}': 'price_table', '{client_section}': 'client_section'}
+
+
+class _TemplateHTMLParser(HTMLParser):
+    """Разбирает HTML из CKEditor в список абзацев с разметкой ReportLab."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.blocks = []
+        self._style = 'normal'
+        self._parts = []
+        # открытые инлайн-теги: (тег HTML, закрывающая разметка ReportLab);
+        # у ссылки без href закрывающая разметка пустая
+        self._open = []
+
+    def _flush(self):
+        # незакрытые в абзаце теги закрываем, иначе Paragraph не разберёт разметку
+        while self._open:
+            self._parts.append(self._open.pop()[1])
+        markup = ''.join(self._parts).strip()
+        while markup.endswith('<br/>'):
+            markup = markup[:-len('<br/>')].rstrip()
+        if markup:
+            self.blocks.append((self._style, markup))
+        self._parts = []
+        self._style = 'normal'
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _BLOCK_TAGS:
+            self._flush()
+            self._style = _BLOCK_TAGS[tag]
+            if tag == 'li':
+                self._parts.append('• ')
+        elif tag in _INLINE_TAGS:
+            self._parts.append(f'<{_INLINE_TAGS[tag]}>')
+            self._open.append((tag, f'</{_INLINE_TAGS[tag]}>'))
+        elif tag == 'br':
+            self._parts.append('<br/>')
+        elif tag == 'a':
+            href = dict(attrs).get('href')
+            if href:
+                self._parts.append(f'<a href="{html.escape(href)}">')
+            self._open.append((tag, '</a>' if href else ''))
+
+    def handle_endtag(self, tag):
+        if tag in _BLOCK_TAGS:
+            self._flush()
+        elif tag in _INLINE_TAGS or tag == 'a':
+            # закрываем до парного открывающего тега; непарный закрывающий пропускаем
+            if not any(open_tag == tag for open_tag, _ in self._open):
+                return
+            while True:
+                open_tag, closing = self._open.pop()
+                self._parts.append(closing)
+                if open_tag == tag:
+                    break
+
+    def handle_data(self, data):
+        self._parts.append(html.escape(data, quote=False))
+
+    def close(self):
+        super().close()
+        self._flush()
+        return self.blocks
+
+
+def _compile_placeholders(markup):
+    """
+    Оставляет в строке только плейсхолдеры вида {name}; всё остальное
+    в фигурных скобках экранируется, чтобы str.format_map не падал на
+    произвольном тексте шаблона.
+    """
+    try:
+        parsed = list(Formatter().parse(markup))
+    except ValueError:
+        return markup.replace('{', '{{').replace('}', '}}')
+
+    result = []
+    for literal, field, spec, conversion in parsed:
+        result.append(literal.replace('{', '{{').replace('}', '}}'))
+        if field is None:
+            continue
+        if field.isidentifier() and not spec and not conversion:
+            result.append(f'{{{field}}}')
+        else:
+            raw = '{' + field + (f'!{conversion}' if conversion else '') + (f':{spec}' if spec else '') + '}'
+            result.append(raw.replace('{', '{{').replace('}', '}}'))
+    return ''.join(result)
+
+
+def compile_proposal_template(content):
+    """
+    Переводит HTML шаблона в список блоков: ('paragraph', стиль, разметка)
+    либо ('price_table',) / ('client_section',) для блочных плейсхолдеров.
+    """
+    parser = _TemplateHTMLParser()
+    parser.feed(content or '')
+    compiled = []
+    for style, markup in parser.close():
+        text = strip_tags(markup).strip()
+        if text in _BLOCK_PLACEHOLDERS:
+            compiled.append((_BLOCK_PLACEHOLDERS[text],))
+        else:
+            compiled.append(('paragraph', style, _compile_placeholders(markup)))
+    return compiled
+
+
+# template_id -> (updated_at, скомпилированные блоки); изменённый шаблон
+# перекомпилируется по несовпадению updated_at — в любом процессе
+_compiled_templates = {}
+
+
+def get_compiled_template(template_id, updated_at, content):
+    cached = _compiled_templates.get(template_id)
+    if cached is not None and cached[0] == updated_at:
+        return cached[1]
+    compiled = compile_proposal_template(content)
+    _compiled_templates[template_id] = (updated_at, compiled)
+    return compiled
+
+
+class _PlaceholderValues(dict):
+    def __missing__(self, key):
+        # неизвестный плейсхолдер оставляем в тексте как есть
+        return '{' + key + '}'
+
+
+def _price_table(ctx, rc):
+    data = [
+        ['Параметр', 'Значение'],
+        ['Площадь, м²', f"{ctx['area']}"],
+        ['Цена за м²', f"{ctx['price_per_m2']} ₸"],
+        ['Итоговая стоимость', f"{ctx['total_price']} ₸"],
+    ]
+    table = Table(data, colWidths=[60*mm, 60*mm])
+    table.setStyle(rc['table_style'])
+    return [table, Spacer(1, 6*mm)]
+
+
+def _client_section(ctx, rc):
+    if not ctx['client_section']:
+        return []
+    elements = [Paragraph("Контактные данные клиента:", rc['header'])]
+    for line in ctx['client_section'].splitlines():
+        elements.append(Paragraph(line, rc['normal']))
+    elements.append(Spacer(1, 6*mm))
+    return elements
+
+
+def _default_body(ctx, rc):
+    normal = rc['normal']
+    elements = [
+        Paragraph("Объект:", rc['header']),
+        Paragraph(f"Блок: {ctx['block_name']}, этаж: {ctx['floor']}", normal),
+        Spacer(1, 6*mm),
+    ]
+    elements += _price_table(ctx, rc)
+    elements += _client_section(ctx, rc)
+
+    elements.append(Paragraph("Условия оплаты: 50% предоплата, 50% — при сдаче объекта.", normal))
+    elements.append(Paragraph("Срок сдачи: согласовывается дополнительно.", normal))
+    elements.append(Spacer(1, 6*mm))
+
+    elements.append(Paragraph("Спасибо за внимание!", normal))
+    elements.append(Paragraph("С уважением, команда Seneca Partners", normal))
+    return elements
+
+
+def _template_body(compiled, ctx, rc):
+    values = _PlaceholderValues({
+        key: html.escape(str(value), quote=False)
+        for key, value in ctx.items()
+        if not key.startswith('template_')
+    })
+    elements = []
+    for block in compiled:
+        if block[0] == 'price_table':
+            elements += _price_table(ctx, rc)
+        elif block[0] == 'client_section':
+            elements += _client_section(ctx, rc)
+        else:
+            _, style, markup = block
+            markup = markup.format_map(values)
+            try:
+                elements.append(Paragraph(markup, rc[style]))
+            except ValueError:
+                # разметка, которую ReportLab не принял, — выводим текстом
+                elements.append(Paragraph(html.escape(strip_tags(markup), quote=False), rc[style]))
+    return elements
+
+
+def write_proposal_pdf(ctx, out, logo=True):
+    """
+    Собирает PDF предложения по готовому контексту (см. Proposal.pdf_context)
+    и пишет его в файловый объект out. Не обращается к БД, поэтому может
+    выполняться в отдельном процессе. logo=False убирает логотип из шапки.
+    """
+    rc = get_pdf_render_context()
+
+    doc = SimpleDocTemplate(
+        out,
+        pagesize=A4,
+        leftMargin=20*mm, rightMargin=20*mm,
+        topMargin=20*mm, bottomMargin=20*mm
+    )
+
+    elements = []
+
+    if logo and rc['logo'] is not None:
+        elements.append(_LogoFlowable(rc['logo'], rc['logo_width'], LOGO_HEIGHT))
+    elements.append(Paragraph("Коммерческое предложение", rc['title']))
+
+
+    elements.append(Paragraph(f"<font color='{rc['brand_secondary'].hexval()}'>Дата: {ctx['created_at']}</font>", rc['normal']))
+    elements.append(Spacer(1, 6*mm))
+
+    compiled = get_compiled_template(
+        ctx['template_id'], ctx['template_updated_at'], ctx['template_content']
+    )
+    if compiled:
+        elements += _template_body(compiled, ctx, rc)
+    else:
+        elements += _default_body(ctx, rc)
+
+    doc.build(elements)
+
+
+def render_proposal_pdf(ctx, logo=True):
+    """То же, что write_proposal_pdf, но возвращает PDF в виде bytes."""
+    buffer = io.BytesIO()
+    write_proposal_pdf(ctx, buffer, logo=logo)
+    return buffer.getvalue()
+
+
+def proposal_pdf_fingerprint(ctx):
+    """Отпечаток входных данных рендера: одинаковый отпечаток — одинаковый PDF."""
+    payload = json.dumps(
+        {'layout': PDF_LAYOUT_VERSION, **ctx},
+        sort_keys=True, default=str, ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
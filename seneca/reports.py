@@ -0,0 +1,68 @@
+import math
+
+
+class ProcessingTimeHistogram:
+    """
+    Гистограмма времени обработки с фиксированным набором корзин:
+    память не зависит от числа заявок, значения добавляются по одному.
+
+    Для перцентилей используются логарифмические корзины с шагом 5%
+    (погрешность оценки — не больше ±2.5%), для отчёта — крупные
+    корзины из DISPLAY_BUCKETS.
+    """
+    RATIO = 1.05
+    MAX_SECONDS = 10 * 365 * 24 * 3600
+    DISPLAY_BUCKETS = [
+        (3600,           'до 1 ч'),
+        (4 * 3600,       '1–4 ч'),
+        (24 * 3600,      '4–24 ч'),
+        (3 * 24 * 3600,  '1–3 дн'),
+        (7 * 24 * 3600,  '3–7 дн'),
+        (30 * 24 * 3600, '7–30 дн'),
+        (math.inf,       'больше 30 дн'),
+    ]
+
+    def __init__(self):
+        # корзина 0 — меньше секунды, корзина i ≥ 1 — [RATIO**(i-1), RATIO**i)
+        self._size = 2 + math.ceil(math.log(self.MAX_SECONDS) / math.log(self.RATIO))
+        self._fine = [0] * self._size
+        self._display = [0] * len(self.DISPLAY_BUCKETS)
+        self.count = 0
+
+    def add(self, seconds):
+        seconds = max(seconds, 0)
+        if seconds < 1:
+            index = 0
+        else:
+            index = min(self._size - 1, 1 + int(math.log(seconds) / math.log(self.RATIO)))
+        self._fine[index] += 1
+
+        for i, (upper, _) in enumerate(self.DISPLAY_BUCKETS):
+            if seconds < upper:
+                self._display[i] += 1
+                break
+        self.count += 1
+
+    def percentile(self, pct):
+        """Оценка перцентиля в секундах (середина корзины) или None."""
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(self.count * pct / 100))
+        seen = 0
+        for index, n in enumerate(self._fine):
+            seen += n
+            if seen >= rank:
+                if index == 0:
+                    return 0.5
+                low = self.RATIO ** (index - 1)
+                return round(math.sqrt(low * low * self.RATIO), 1)
+        return None
+
+    def percentiles(self, *pcts):
+        return {f'p{p}': self.percentile(p) for p in pcts}
+
+    def buckets(self):
+        return [
+            {'label': label, 'count': n}
+            for (_, label), n in zip(self.DISPLAY_BUCKETS, self._display)
+        ]
@@ -14,9 +14,23 @@ class BankSerializer(serializers.ModelSerializer):
 
 
 class VideoSerializer(serializers.ModelSerializer):
+    # метаданные YouTube из локального кеша; None, пока не загружены
+    oembed = serializers.SerializerMethodField()
+
     class Meta:
         model = Video
-        fields = ['id', 'youtube_link', 'description', 'year', 'month']
+        fields = ['id', 'youtube_link', 'description', 'year', 'month', 'published_on', 'oembed']
+
+    def get_oembed(self, obj):
+        if obj.oembed_fetched_at is None:
+            return None
+        return {
+            'title':            obj.oembed_title,
+            'thumbnail_url':    obj.oembed_thumbnail_url,
+            'thumbnail_width':  obj.oembed_thumbnail_width,
+            'thumbnail_height': obj.oembed_thumbnail_height,
+            'fetched_at':       obj.oembed_fetched_at,
+        }
 
 
 class ApplicationSerializer(serializers.ModelSerializer):
@@ -1,19 +1,68 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
-from django.core.mail import mail_admins
-from .models import Application
+from .models import (
+    AdminNotification, Application, ApplicationDailyStats, ApplicationStatusTransition, Video,
+)
 
 @receiver(post_save, sender=Application)
 def notify_admin_new_application(sender, instance, created, **kwargs):
+    # письмо не отправляется здесь: запись в outbox разбирает
+    # воркер send_admin_notifications, и POST не ждёт SMTP
     if not created:
         return
 
-    subject = f'Новая заявка от {instance.name}'
-    message = (
-        f'Поступила новая заявка:\n\n'
-        f'ID:    {instance.id}\n'
-        f'Имя:   {instance.name}\n'
-        f'Телефон: {instance.phone}\n'
-        f'Дата:  {instance.created_at.strftime("%Y-%m-%d %H:%M")}\n'
+    AdminNotification.for_application(instance)
+
+
+@receiver(pre_save, sender=Application)
+def remember_previous_status(sender, instance, **kwargs):
+    # прежний статус и вклад заявки в дневную сводку, чтобы после сохранения
+    # записать переход и вычесть старый вклад; при неизменном статусе — ничего
+    instance._status_before = None
+    if instance.pk is None:
+        return
+    old = Application.objects.filter(pk=instance.pk).only('status', 'created_at', 'updated_at').first()
+    if old is None or old.status == instance.status:
+        return
+    instance._status_before = (
+        old.status,
+        ApplicationDailyStats.contribution(old.status, old.created_at, old.closed_at()),
     )
-    mail_admins(subject, message)
+
+
+@receiver(post_save, sender=Application)
+def record_status_change(sender, instance, created, **kwargs):
+    before = getattr(instance, '_status_before', None)
+    if created:
+        from_status, at = '', instance.created_at
+    elif before is not None:
+        from_status, at = before[0], instance.updated_at
+    else:
+        return
+
+    ApplicationStatusTransition.objects.create(
+        application=instance, from_status=from_status, to_status=instance.status, at=at,
+    )
+
+    if before is not None:
+        date, status, seconds = before[1]
+        ApplicationDailyStats.apply(date, status, -1, -seconds)
+    date, status, seconds = ApplicationDailyStats.contribution(
+        instance.status, instance.created_at, at
+    )
+    ApplicationDailyStats.apply(date, status, 1, seconds)
+
+
+@receiver(pre_delete, sender=Application)
+def discount_application_stats(sender, instance, **kwargs):
+    # pre_delete: журнал переходов ещё не удалён каскадом
+    date, status, seconds = ApplicationDailyStats.contribution(
+        instance.status, instance.created_at, instance.closed_at()
+    )
+    ApplicationDailyStats.apply(date, status, -1, -seconds)
+
+
+@receiver(post_save, sender=Video)
+@receiver(post_delete, sender=Video)
+def invalidate_video_archive(sender, instance, **kwargs):
+    Video.invalidate_archive(instance.site_id)
@@ -1,6 +1,31 @@
-from django.test import TestCase
+import datetime
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core import mail
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from django.contrib.sites.models import Site
 from seneca.models import *
+from seneca import linkcheck, oembed, pdf
+from seneca.linkcheck import LinkChecker
+from seneca.serializers import VideoSerializer
+from seneca.reports import ProcessingTimeHistogram
 
 
 class ModelsTestCase(TestCase):
@@ -30,3 +55,483 @@ class ModelsTestCase(TestCase):
         floor = Floor.objects.create(site=self.site, block=block, level='2')
         plan = Plan.objects.create(site=self.site, floor=floor, price_per_m2=1500)
         self.assertEqual(plan.get_price_per_m2(), 1500)
+
+    def test_startup_does_not_import_reportlab(self):
+        # ReportLab и шрифт грузятся только при генерации PDF (см. seneca/pdf.py)
+        code = (
+            "import django, sys; django.setup(); "
+            "import seneca.models, seneca_project.urls; "
+            "print(any(m.startswith('reportlab') for m in sys.modules))"
+        )
+        out = subprocess.run(
+            [sys.executable, '-c', code], cwd=settings.BASE_DIR, check=True,
+            capture_output=True, text=True,
+            env={**os.environ, 'DJANGO_SETTINGS_MODULE': 'seneca_project.settings'},
+        ).stdout
+        self.assertEqual(out.strip().splitlines()[-1], 'False')
+
+
+class ProposalPdfTestCase(TestCase):
+
+    def setUp(self):
+        media_root = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+
+        site = Site.objects.get(pk=settings.SITE_ID)
+        block = Block.objects.create(site=site, name='A')
+        floor = Floor.objects.create(site=site, block=block, level='1')
+        Plan.objects.create(site=site, floor=floor, price_per_m2=1000)
+        template = ProposalTemplate.objects.create(name='Базовый', content='')
+        app = Application.objects.create(name='Иван', phone='+77001234567')
+        self.proposal = Proposal.objects.create(
+            template=template, application=app,
+            block=block, floor=floor, area=50, finish_level='basic',
+        )
+
+    def test_render_context_is_shared(self):
+        self.assertIs(pdf.get_pdf_render_context(), pdf.get_pdf_render_context())
+
+    def test_generate_pdf(self):
+        self.proposal.generate_pdf()
+        self.proposal.refresh_from_db()
+        self.assertTrue(self.proposal.pdf_file.name.endswith('.pdf'))
+        with self.proposal.pdf_file.open('rb') as f:
+            self.assertTrue(f.read().startswith(b'%PDF'))
+
+    def test_logo_is_embedded_as_page_xobject(self):
+        data = pdf.render_proposal_pdf(self.proposal.pdf_context())
+        resources = re.search(rb'/Resources <<(.*?)>>\s*/Rotate', data, re.S).group(1)
+        self.assertIn(b'/XObject', resources)
+        self.assertEqual(data.count(b'/Subtype /Image'), 1)
+
+        without_logo = pdf.render_proposal_pdf(self.proposal.pdf_context(), logo=False)
+        self.assertNotIn(b'/Subtype /Image', without_logo)
+
+    def test_pdf_job_queue(self):
+        job = ProposalPDFJob.enqueue(self.proposal)
+        self.assertEqual(ProposalPDFJob.enqueue(self.proposal), job)
+
+        call_command('process_pdf_jobs', once=True, stdout=StringIO())
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, ProposalPDFJob.STATUS_DONE)
+        self.assertIsNotNone(job.finished_at)
+        self.proposal.refresh_from_db()
+        self.assertTrue(self.proposal.pdf_file)
+
+    def test_generate_pdfs_bulk_with_process_pool(self):
+        second = Proposal.objects.create(
+            template=self.proposal.template, block=self.proposal.block,
+            floor=self.proposal.floor, area=70, finish_level='none',
+        )
+        # внутри транзакции (как при ATOMIC_REQUESTS): пул не должен ломать соединение
+        with transaction.atomic():
+            count, failed = Proposal.generate_pdfs(Proposal.objects.all(), max_workers=2)
+
+        self.assertEqual((count, failed), (2, []))
+        for proposal in (self.proposal, second):
+            proposal.refresh_from_db()
+            self.assertEqual(proposal.pdf_file.name, f'proposals/proposal_{proposal.pk}.pdf')
+
+    def test_generate_pdfs_reports_failures_and_keeps_the_rest(self):
+        broken = Proposal.objects.create(
+            template=self.proposal.template, block=self.proposal.block,
+            floor=self.proposal.floor, area=70, finish_level='none',
+        )
+        render = pdf.render_proposal_pdf
+
+        def render_or_fail(ctx, logo=True):
+            if ctx['area'] == '70.00':
+                raise ValueError('битая разметка')
+            return render(ctx, logo=logo)
+
+        with mock.patch.object(pdf, 'render_proposal_pdf', render_or_fail):
+            count, failed = Proposal.generate_pdfs(Proposal.objects.all(), max_workers=1)
+
+        self.assertEqual(count, 1)
+        self.assertEqual(failed, [(broken, 'битая разметка')])
+        self.proposal.refresh_from_db()
+        self.assertTrue(self.proposal.pdf_file)
+
+    def test_generate_pdf_skips_unchanged_inputs(self):
+        self.assertTrue(self.proposal.generate_pdf())
+        name = self.proposal.pdf_file.name
+        self.assertFalse(self.proposal.generate_pdf())
+        self.assertEqual(Proposal.generate_pdfs(Proposal.objects.all()), (0, []))
+
+        self.proposal.area = 60
+        self.proposal.save()
+        self.assertTrue(self.proposal.generate_pdf())
+        self.assertEqual(self.proposal.pdf_file.name, name)
+
+    def test_compile_proposal_template(self):
+        compiled = pdf.compile_proposal_template(
+            '<h2>Блок {block_name}</h2>'
+            '<p>Площадь <strong>{area}</strong> м², {unknown} и {0}</p>'
+            '<p>{price_table}</p><p>&nbsp;</p>'
+        )
+        self.assertEqual(compiled, [
+            ('paragraph', 'header', 'Блок {block_name}'),
+            ('paragraph', 'normal', 'Площадь <b>{area}</b> м², {unknown} и {{0}}'),
+            ('price_table',),
+        ])
+
+    def test_template_with_unclosed_inline_tags_renders(self):
+        compiled = pdf.compile_proposal_template(
+            '<p><strong>Итого {total_price}</p><p>текст</em> <a>без ссылки</a></p>'
+        )
+        self.assertEqual(compiled, [
+            ('paragraph', 'normal', '<b>Итого {total_price}</b>'),
+            ('paragraph', 'normal', 'текст без ссылки'),
+        ])
+
+        self.proposal.template.content = '<p><strong>Итого {total_price}</p>'
+        self.proposal.template.save()
+        self.assertTrue(self.proposal.generate_pdf())
+
+    def test_compiled_template_cache_follows_updated_at(self):
+        template = self.proposal.template
+        template.content = '<p>Итого: {total_price}</p>'
+        template.save()
+        ctx = self.proposal.pdf_context()
+        self.assertTrue(pdf.render_proposal_pdf(ctx).startswith(b'%PDF'))
+        compiled = pdf._compiled_templates[template.pk][1]
+        self.assertEqual(compiled, [('paragraph', 'normal', 'Итого: {total_price}')])
+
+        template.content = '<p>Площадь: {area}</p>'
+        template.save()
+        ctx = self.proposal.pdf_context()
+        self.assertEqual(
+            pdf.get_compiled_template(ctx['template_id'], ctx['template_updated_at'], ctx['template_content']),
+            [('paragraph', 'normal', 'Площадь: {area}')],
+        )
+
+    def test_reprice_after_plan_price_change(self):
+        Plan.objects.filter(floor=self.proposal.floor).update(price_per_m2=1200)
+
+        call_command('reprice_proposals', regenerate_pdf=True, stdout=StringIO())
+
+        self.proposal.refresh_from_db()
+        self.assertEqual(self.proposal.price_per_m2, 1200)
+        self.assertEqual(self.proposal.total_price, 60000)
+        self.assertEqual(self.proposal.pdf_jobs.filter(status=ProposalPDFJob.STATUS_QUEUED).count(), 1)
+        self.assertEqual(Proposal.reprice(), 0)
+
+
+class AdminNotificationTestCase(TestCase):
+
+    def test_new_application_goes_to_outbox(self):
+        Application.objects.create(name='Иван', phone='+77001234567')
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(AdminNotification.objects.get().subject, 'Новая заявка от Иван')
+
+        call_command('send_admin_notifications', once=True, stdout=StringIO())
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn('+77001234567', mail.outbox[0].body)
+        self.assertFalse(AdminNotification.objects.filter(sent_at__isnull=True).exists())
+
+    def test_digest_sends_one_email(self):
+        for i in range(3):
+            Application.objects.create(name=f'Клиент {i}', phone=str(i))
+
+        call_command('send_admin_notifications', once=True, digest=True, stdout=StringIO())
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn('Клиент 2', mail.outbox[0].body)
+
+    def test_newline_in_name_does_not_break_subject(self):
+        Application.objects.create(name='Иван\r\nBcc: x@example.com', phone='1')
+        self.assertEqual(AdminNotification.objects.get().subject,
+                         'Новая заявка от Иван Bcc: x@example.com')
+
+        call_command('send_admin_notifications', once=True, stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_failing_notification_is_parked_without_blocking_queue(self):
+        for name in ('первая', 'сбойная', 'третья'):
+            Application.objects.create(name=name, phone='1')
+        send_messages = mail.get_connection().send_messages.__func__
+
+        def fail_on_broken(backend, messages):
+            if 'сбойная' in messages[0].subject:
+                raise ValueError('битое письмо')
+            return send_messages(backend, messages)
+
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', fail_on_broken):
+            for _ in range(AdminNotification.MAX_ATTEMPTS + 1):
+                call_command('send_admin_notifications', once=True, stdout=StringIO())
+
+        # остальные ушли ровно по одному разу, сбойное отложено после MAX_ATTEMPTS
+        self.assertEqual(sorted(m.subject for m in mail.outbox), [
+            f'{settings.EMAIL_SUBJECT_PREFIX}Новая заявка от первая',
+            f'{settings.EMAIL_SUBJECT_PREFIX}Новая заявка от третья',
+        ])
+        broken = AdminNotification.objects.get(sent_at__isnull=True)
+        self.assertEqual((broken.attempts, broken.last_error),
+                         (AdminNotification.MAX_ATTEMPTS, 'битое письмо'))
+        self.assertFalse(AdminNotification.pending().exists())
+
+
+class ApplicationSearchTestCase(TestCase):
+
+    def setUp(self):
+        self.ivan = Application.objects.create(name='Иван Петров', phone='+7 (700) 123-45-67')
+        self.anna = Application.objects.create(name='Анна', phone='87011112233')
+
+    def test_phone_digits_normalized(self):
+        self.assertEqual(self.ivan.phone_digits, '77001234567')
+        self.assertEqual(self.anna.phone_digits, '77011112233')
+
+    def test_search_by_name_and_phone(self):
+        self.assertEqual(list(Application.objects.search('петр')), [self.ivan])
+        self.assertEqual(list(Application.objects.search('8 701 111 22 33')), [self.anna])
+        self.assertEqual(list(Application.objects.search('123-45')), [self.ivan])
+        self.assertEqual(list(Application.objects.search('Ан')), [self.anna])
+
+    def test_search_index_follows_updates(self):
+        self.anna.name = 'Анастасия'
+        self.anna.save()
+        self.assertEqual(list(Application.objects.search('наст')), [self.anna])
+        self.anna.delete()
+        self.assertFalse(Application.objects.search('наст').exists())
+
+
+class ApplicationDailyStatsTestCase(TestCase):
+
+    def snapshot(self):
+        return list(ApplicationDailyStats.objects.values_list(
+            'date', 'new_count', 'in_work_count', 'closed_count'
+        ))
+
+    def test_incremental_stats_match_rebuild(self):
+        apps = [Application.objects.create(name=str(i), phone=str(i)) for i in range(4)]
+        apps[0].status = Application.STATUS_IN_WORK
+        apps[0].save()
+        apps[1].status = Application.STATUS_CLOSED
+        apps[1].save()
+        apps[1].comment = 'перезвонить'
+        apps[1].save()
+        apps[2].delete()
+
+        incremental = self.snapshot()
+        self.assertEqual([row[1:] for row in incremental], [(1, 1, 1)])
+        processing = ApplicationDailyStats.objects.get().processing_seconds
+
+        call_command('rebuild_application_stats', stdout=StringIO())
+        self.assertEqual(self.snapshot(), incremental)
+        self.assertAlmostEqual(ApplicationDailyStats.objects.get().processing_seconds, processing, places=3)
+
+    def test_cache_version_never_returns_to_old_value(self):
+        old = ApplicationDailyStats.cache_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            ApplicationDailyStats.invalidate_cache()
+        bumped = ApplicationDailyStats.cache_version()
+        # ключ версии вытеснен из кеша — новая версия не совпадает с прежними
+        cache.delete(ApplicationDailyStats.CACHE_VERSION_KEY)
+        self.assertEqual(len({old, bumped, ApplicationDailyStats.cache_version()}), 3)
+
+
+class ArchivedApplicationTestCase(TestCase):
+
+    def test_archive_moves_only_old_closed_applications(self):
+        old, recent, open_app = (
+            Application.objects.create(name=name, phone=str(i)) for i, name in enumerate('ABC')
+        )
+        for app in (old, recent):
+            app.status = Application.STATUS_CLOSED
+            app.save()
+        long_ago = timezone.now() - datetime.timedelta(days=400)
+        Application.objects.filter(pk__in=[old.pk, open_app.pk]).update(created_at=long_ago)
+        old.transitions.update(at=long_ago)
+
+        with CaptureQueriesContext(connection) as queries:
+            call_command('archive_applications', '--days', '30', '--batch-size', '1', stdout=StringIO())
+        # без построчных сигналов: ни запросов к журналу на каждую заявку, ни удаления по одной
+        self.assertEqual(
+            [q['sql'] for q in queries if q['sql'].startswith('DELETE FROM "seneca_application"')],
+            [f'DELETE FROM "seneca_application" WHERE "id" IN ({old.pk})'],
+        )
+
+        archived = ArchivedApplication.objects.get()
+        self.assertEqual((archived.pk, archived.phone_digits), (old.pk, old.phone_digits))
+        self.assertEqual(archived.closed_at, long_ago)
+        self.assertEqual(
+            set(Application.objects.values_list('pk', flat=True)), {recent.pk, open_app.pk},
+        )
+        self.assertFalse(ApplicationStatusTransition.objects.filter(application_id=old.pk).exists())
+        # из дневной сводки архивная заявка вычтена
+        self.assertEqual(
+            sum(row.total_count for row in ApplicationDailyStats.objects.all()), 2,
+        )
+
+
+class ProcessingTimeHistogramTestCase(TestCase):
+
+    def test_percentiles_and_buckets(self):
+        histogram = ProcessingTimeHistogram()
+        for minutes in range(1, 101):
+            histogram.add(minutes * 60)
+        histogram.add(40 * 24 * 3600)
+
+        p50 = histogram.percentile(50)
+        self.assertLess(abs(p50 - 51 * 60) / (51 * 60), 0.03)
+        self.assertGreater(histogram.percentile(99), 99 * 60 * 0.97)
+        self.assertEqual(histogram.percentile(100), histogram.percentiles(100)['p100'])
+        self.assertEqual(
+            [b['count'] for b in histogram.buckets()],
+            [59, 41, 0, 0, 0, 0, 1],
+        )
+        self.assertIsNone(ProcessingTimeHistogram().percentile(50))
+
+
+class ApplicationStatusTransitionTestCase(TestCase):
+
+    def test_status_transitions_drive_processing_time(self):
+        app = Application.objects.create(name='Иван', phone='1')
+        app.status = Application.STATUS_CLOSED
+        app.save()
+        closed_at = app.closed_at()
+        processing = ApplicationDailyStats.objects.get().processing_seconds
+
+        app.comment = 'правка после закрытия'
+        app.save()
+
+        self.assertEqual(
+            list(app.transitions.values_list('from_status', 'to_status')),
+            [('', Application.STATUS_NEW), (Application.STATUS_NEW, Application.STATUS_CLOSED)],
+        )
+        self.assertEqual(app.closed_at(), closed_at)
+        self.assertEqual(Application.objects.with_closed_at().get(pk=app.pk).closed_at(), closed_at)
+        self.assertEqual(ApplicationDailyStats.objects.get().processing_seconds, processing)
+        self.assertEqual(set(app.time_in_status()), {Application.STATUS_NEW, Application.STATUS_CLOSED})
+
+        call_command('rebuild_application_stats', stdout=StringIO())
+        self.assertAlmostEqual(ApplicationDailyStats.objects.get().processing_seconds, processing, places=3)
+
+
+class _OEmbedHandler(BaseHTTPRequestHandler):
+    """Локальная замена youtube.com/oembed: известное видео — JSON, остальные — 404."""
+
+    def do_GET(self):
+        url = parse_qs(urlparse(self.path).query)['url'][0]
+        if url.endswith('missing'):
+            self.send_response(404)
+            self.end_headers()
+            return
+        body = json.dumps({
+            'title': f'Видео {url[-1]}', 'thumbnail_url': 'https://i.ytimg.com/vi/x/hqdefault.jpg',
+            'thumbnail_width': 480, 'thumbnail_height': 360,
+        }).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class VideoOEmbedTestCase(TestCase):
+
+    def setUp(self):
+        server = ThreadingHTTPServer(('127.0.0.1', 0), _OEmbedHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.enterContext(override_settings(
+            YOUTUBE_OEMBED_ENDPOINT=f'http://127.0.0.1:{server.server_port}/oembed',
+        ))
+        site = Site.objects.get_current()
+        self.video = Video.objects.create(site=site, youtube_link='https://youtu.be/1',
+                                          year='2024', month='Май')
+        self.missing = Video.objects.create(site=site, youtube_link='https://youtu.be/missing',
+                                            year='2024', month='Май')
+
+    def test_refresh_command_fills_metadata_and_skips_fresh(self):
+        out = StringIO()
+        call_command('refresh_video_oembed', stdout=out)
+        self.assertIn('Обновлено видео: 1, ошибок: 1', out.getvalue())
+
+        self.video.refresh_from_db()
+        self.assertEqual(self.video.oembed_title, 'Видео 1')
+        self.assertEqual((self.video.oembed_thumbnail_width, self.video.oembed_thumbnail_height), (480, 360))
+        self.assertEqual(VideoSerializer(self.video).data['oembed']['title'], 'Видео 1')
+        self.assertIsNone(VideoSerializer(self.missing).data['oembed'])
+
+        # свежие метаданные повторно не запрашиваются
+        self.assertEqual(list(oembed.stale_videos()), [self.missing])
+
+    def test_apply_skips_too_long_thumbnail_url(self):
+        oembed.store({self.video.youtube_link: {'title': 'В' * 500,
+                                                 'thumbnail_url': 'https://i.ytimg.com/' + 'x' * 300}})
+        self.video.refresh_from_db()
+        self.assertEqual(len(self.video.oembed_title), 300)
+        self.assertEqual(self.video.oembed_thumbnail_url, '')
+
+
+class _SlowHandler(BaseHTTPRequestHandler):
+    """Отвечает с задержкой и запоминает, сколько запросов шло одновременно."""
+    lock = threading.Lock()
+    active = peak = 0
+
+    def do_HEAD(self):
+        cls = type(self)
+        with cls.lock:
+            cls.active += 1
+            cls.peak = max(cls.peak, cls.active)
+        time.sleep(0.1)
+        with cls.lock:
+            cls.active -= 1
+        self.send_response(404 if self.path == '/missing' else 200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    do_GET = do_HEAD
+
+    def log_message(self, *args):
+        pass
+
+
+class LinkCheckerTestCase(TestCase):
+
+    def setUp(self):
+        server = ThreadingHTTPServer(('127.0.0.1', 0), _SlowHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.base = f'http://127.0.0.1:{server.server_port}'
+
+    def test_concurrent_checks_respect_per_host_limit(self):
+        base = self.base
+        urls = [f'{base}/page{i}' for i in range(8)] + [f'{base}/missing', f'{base}/page0']
+
+        with LinkChecker(timeout=2, max_workers=8, per_host=3) as checker:
+            statuses = checker.check_many(urls)
+
+        self.assertEqual(len(statuses), 9)
+        self.assertEqual(statuses[f'{base}/page0'][0], 200)
+        # HEAD вернул 404 — повтор через GET тоже 404
+        self.assertEqual(statuses[f'{base}/missing'][0], 404)
+        self.assertGreaterEqual(statuses[f'{base}/page0'][1], 100)
+        self.assertEqual(_SlowHandler.peak, 3)
+
+    def test_recheck_only_new_and_stale_urls(self):
+        video = Video.objects.create(
+            site=Site.objects.get_current(), youtube_link=f'{self.base}/video',
+            description=f'см. {self.base}/missing и {self.base}/video', year='2024', month='Май',
+        )
+        out = StringIO()
+        call_command('check_links', stdout=out)
+        self.assertIn('Проверено ссылок: 2', out.getvalue())
+        self.assertEqual(
+            dict(LinkCheckResult.objects.values_list('url', 'ok')),
+            {f'{self.base}/video': True, f'{self.base}/missing': False},
+        )
+        self.assertEqual(linkcheck.recheck(), (0, 0))
+
+        video.description = f'новая ссылка {self.base}/page1'
+        video.save()
+        self.assertEqual(linkcheck.recheck(), (1, 1))
+        self.assertEqual(linkcheck.recheck(ttl_hours=0), (2, 0))
+
@@ -1,9 +1,25 @@
-from django.test import TestCase, Client
+from django.test import TestCase, Client, RequestFactory, override_settings
 from django.urls import reverse
 from django.contrib.auth.models import User
-from seneca.models import Application, Block, Floor, Plan
+from django.contrib.sites.models import Site
+from seneca.models import (
+    AdminNotification, Application, ApplicationDailyStats, ArchivedApplication, Bank, Block, Floor,
+    IdempotencyKey, LinkCheckResult, Plan, Proposal, ProposalPDFJob, ProposalTemplate, Video,
+)
+import csv
+import datetime
+import io
 import json
 
+import openpyxl
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.core.management import call_command
+from django.utils import timezone
+
+from seneca.admin import export_applications_csv, export_applications_xlsx
+
 class ViewsTestCase(TestCase):
     def setUp(self):
         # создаём staff-пользователя для @staff_member_required views
@@ -39,6 +55,8 @@ class ViewsTestCase(TestCase):
         self.assertIn('closed_applications', data)
         self.assertIn('conversion_rate_%', data)
         self.assertIn('avg_processing_secs', data)
+        self.assertEqual(set(data['processing_percentiles_secs']), {'p50', 'p90', 'p99'})
+        self.assertEqual(sum(b['count'] for b in data['processing_histogram']), 1)
 
     def test_application_api_crud(self):
         # список
@@ -53,3 +71,231 @@ class ViewsTestCase(TestCase):
         obj_id = resp2.json()['id']
         resp3 = self.client.get(f'/api/applications/{obj_id}/')
         self.assertEqual(resp3.status_code, 200)
+
+    def test_proposal_generate_enqueues_job(self):
+        block = Block.objects.create(name='A')
+        floor = Floor.objects.create(block=block, level='1')
+        Plan.objects.create(floor=floor, price_per_m2=1000)
+        template = ProposalTemplate.objects.create(name='T', content='')
+        proposal = Proposal.objects.create(template=template, block=block, floor=floor,
+                                           area=10, finish_level='none')
+
+        url = reverse('object_admin:proposal-generate', args=[proposal.pk])
+        resp = self.client.get(url, HTTP_REFERER='/admin/')
+        self.assertEqual(resp.status_code, 302)
+        self.assertEqual(proposal.pdf_jobs.get().status, ProposalPDFJob.STATUS_QUEUED)
+        self.assertFalse(Proposal.objects.get(pk=proposal.pk).pdf_file)
+
+    def test_proposal_pdf_preview_streams_without_storage(self):
+        block = Block.objects.create(name='A')
+        floor = Floor.objects.create(block=block, level='1')
+        Plan.objects.create(floor=floor, price_per_m2=1000)
+        template = ProposalTemplate.objects.create(name='T', content='')
+        proposal = Proposal.objects.create(template=template, block=block, floor=floor,
+                                           area=10, finish_level='none')
+
+        resp = self.client.get(reverse('object_admin:proposal-pdf', args=[proposal.pk]))
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp['Content-Type'], 'application/pdf')
+        self.assertTrue(b''.join(resp.streaming_content).startswith(b'%PDF'))
+        self.assertFalse(Proposal.objects.get(pk=proposal.pk).pdf_file)
+
+    def test_application_bulk_create_dedupes_by_phone(self):
+        Application.objects.create(name='Старый', phone='+7 (700) 111-22-33')
+        AdminNotification.objects.all().delete()
+        payload = [
+            {'name': 'D', 'phone': '87001112233'},   # тот же номер, что у «Старый»
+            {'name': 'E', 'phone': '+7 701 000 00 01'},
+            {'name': 'F', 'phone': '8 701 000-00-01'},  # дубль внутри пачки
+            {'name': 'G', 'phone': '+77010000002'},
+        ]
+        resp = self.client.post('/api/applications/bulk/', data=json.dumps(payload),
+                                content_type='application/json')
+        self.assertEqual(resp.status_code, 201)
+        data = resp.json()
+        self.assertEqual([a['name'] for a in data['created']], ['E', 'G'])
+        self.assertEqual([s['index'] for s in data['skipped']], [0, 2])
+        self.assertEqual(AdminNotification.objects.count(), 1)
+
+    def test_application_create_idempotency_key(self):
+        AdminNotification.objects.all().delete()
+        payload = json.dumps({'name': 'Повтор', 'phone': '+77001234567'})
+        first = self.client.post('/api/applications/', data=payload, content_type='application/json',
+                                 HTTP_IDEMPOTENCY_KEY='abc-1')
+        retry = self.client.post('/api/applications/', data=payload, content_type='application/json',
+                                 HTTP_IDEMPOTENCY_KEY='abc-1')
+        self.assertEqual((first.status_code, retry.status_code), (201, 201))
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(Application.objects.filter(name='Повтор').count(), 1)
+        self.assertEqual(AdminNotification.objects.count(), 1)
+
+        other = self.client.post('/api/applications/', data=json.dumps({'name': 'X', 'phone': '1'}),
+                                 content_type='application/json', HTTP_IDEMPOTENCY_KEY='abc-1')
+        self.assertEqual(other.status_code, 422)
+
+        # после TTL ключ считается свободным и вычищается командой
+        IdempotencyKey.objects.update(created_at=timezone.now() - datetime.timedelta(days=2))
+        call_command('purge_idempotency_keys', stdout=io.StringIO())
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    def test_video_years_months_from_published_on(self):
+        site = Site.objects.get_current()
+        for year, month, day in [('2023', 'Июнь', '1'), ('2024', 'май', '21'),
+                                 ('2024', 'Сентябрь', ''), ('2024', 'Декабрь', '3')]:
+            Video.objects.create(site=site, youtube_link='http://youtu.be/x',
+                                 year=year, month=month, date=day)
+
+        self.assertEqual(self.client.get('/api/videos/years/').json(), ['2024', '2023'])
+        self.assertEqual(self.client.get('/api/videos/months/', {'year': '2024'}).json(),
+                         ['Декабрь', 'Сентябрь', 'Май'])
+
+        resp = self.client.get('/api/videos/', {'year': '2024', 'month': 'Май'})
+        self.assertEqual([v['published_on'] for v in resp.json()['results']], ['2024-05-21'])
+        resp = self.client.get('/api/videos/', {'year': '2024', 'month': 'Декабрь'})
+        self.assertEqual([v['published_on'] for v in resp.json()['results']], ['2024-12-03'])
+
+        # год вне диапазона datetime.date — пустой ответ, а не 500
+        for params in ({'year': '0'}, {'year': '9999', 'month': 'Декабрь'}, {'year': '²'}):
+            resp = self.client.get('/api/videos/', params)
+            self.assertEqual((resp.status_code, resp.json()['results']), (200, []))
+        self.assertEqual(self.client.get('/api/videos/months/', {'year': '0'}).json(), [])
+
+    def test_video_archive_tree_cached_per_site(self):
+        cache.clear()
+        site = Site.objects.get_current()
+        with self.captureOnCommitCallbacks(execute=True):
+            for year, month in [('2023', 'Июнь'), ('2024', 'Май'), ('2024', 'Май'), ('2024', 'Июль')]:
+                Video.objects.create(site=site, youtube_link='http://youtu.be/x', year=year, month=month)
+
+        tree = self.client.get('/api/videos/archive/').json()
+        self.assertEqual([(y['year'], y['count']) for y in tree], [('2024', 3), ('2023', 1)])
+        self.assertEqual([(m['month'], m['count']) for m in tree[0]['months']], [('Июль', 1), ('Май', 2)])
+        # повторный вызов — только чтение из кеша, без запроса к видео
+        with CaptureQueriesContext(connection) as queries:
+            Video.archive_tree(site)
+        self.assertFalse([q for q in queries if 'seneca_video' in q['sql']])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Video.objects.filter(month='Июнь').get().delete()
+        tree = self.client.get('/api/videos/archive/').json()
+        self.assertEqual([y['year'] for y in tree], ['2024'])
+
+    def test_link_checker_serves_stored_results(self):
+        site = Site.objects.get_current()
+        Video.objects.create(site=site, youtube_link='https://example.com/ok', year='2024', month='Май')
+        Video.objects.create(site=site, youtube_link='https://example.com/new', year='2024', month='Май')
+        LinkCheckResult.objects.create(
+            url_hash=LinkCheckResult.hash_url('https://example.com/ok'), url='https://example.com/ok',
+            status_code=200, ok=True, latency_ms=12, checked_at=timezone.now(),
+        )
+
+        data = self.client.get(reverse('object_admin:link_checker'), {'format': 'json'}).json()
+        self.assertEqual([(r['url'], r['status']) for r in data['all_checked']],
+                         [('https://example.com/ok', 200)])
+        self.assertEqual([r['url'] for r in data['pending']], ['https://example.com/new'])
+        self.assertEqual(data['broken'], [])
+
+    def test_application_api_search(self):
+        Application.objects.create(name='Пётр', phone='+7 (705) 555-44-33')
+        resp = self.client.get('/api/applications/', {'search': '87055554433'})
+        self.assertEqual([a['name'] for a in resp.json()['results']], ['Пётр'])
+
+    def test_application_api_cursor_pagination(self):
+        for i in range(5):
+            Application.objects.create(name=f'P{i}', phone=str(i))
+
+        resp = self.client.get('/api/applications/', {'page_size': 3})
+        page = resp.json()
+        self.assertEqual([a['name'] for a in page['results']], ['P4', 'P3', 'P2'])
+
+        names = []
+        url = page['next']
+        while url:
+            page = self.client.get(url).json()
+            names += [a['name'] for a in page['results']]
+            url = page['next']
+        self.assertEqual(names, ['P1', 'P0', 'B', 'A'])
+
+    def test_catalog_endpoints_are_paginated(self):
+        for name in ('Б', 'А', 'В'):
+            Bank.objects.create(name=name, rate='8.50')
+        for name in ('Б', 'В'):
+            block = Block.objects.create(name=name)
+            Floor.objects.create(block=block, level='1')
+
+        page = self.client.get('/api/banks/', {'page_size': 2}).json()
+        self.assertEqual([b['name'] for b in page['results']], ['А', 'Б'])
+        self.assertEqual([b['name'] for b in self.client.get(page['next']).json()['results']], ['В'])
+
+        for url in ('/api/blocks/', '/api/floors/'):
+            page = self.client.get(url, {'page_size': 1}).json()
+            self.assertEqual(len(page['results']), 1)
+            self.assertIsNotNone(page['next'])
+
+    @override_settings(API_MAX_PAGE_SIZE=2)
+    def test_page_size_ceiling(self):
+        resp = self.client.get('/api/applications/', {'page_size': 1000})
+        self.assertEqual(len(resp.json()['results']), 2)
+
+    def test_export_applications_csv_and_xlsx(self):
+        request = RequestFactory().post('/')
+        queryset = Application.objects.all()
+
+        resp = export_applications_csv(None, request, queryset)
+        rows = list(csv.reader(io.StringIO(b''.join(resp.streaming_content).decode('utf-8-sig'))))
+        self.assertEqual(rows[0][:3], ['ID', 'Имя', 'Телефон'])
+        self.assertEqual({r[1]: r[3] for r in rows[1:]}, {'A': 'Новая', 'B': 'Закрыта'})
+
+        resp = export_applications_xlsx(None, request, queryset)
+        wb = openpyxl.load_workbook(io.BytesIO(b''.join(resp.streaming_content)))
+        self.assertEqual(wb['Заявки'].max_row, 3)
+
+    def test_applications_summary_reads_daily_stats(self):
+        url = reverse('object_admin:applications_summary')
+        data = self.client.get(f'{url}?format=json').json()
+        self.assertEqual(data['total_applications'], 2)
+        self.assertEqual(data['closed_applications'], 1)
+        self.assertEqual(data['conversion_rate_%'], 50.0)
+
+        ApplicationDailyStats.objects.all().delete()
+        data = self.client.get(f'{url}?format=json').json()
+        self.assertEqual(data['total_applications'], 0)
+
+    def test_applications_summary_include_archive(self):
+        cache.clear()
+        app = Application.objects.get(name='B')
+        app.transitions.update(at=app.created_at + datetime.timedelta(hours=2))
+        ApplicationDailyStats.rebuild()
+        # закрытие «в будущем»: отрицательный порог архивирует его сразу
+        ArchivedApplication.archive(older_than_days=-1)
+
+        url = reverse('object_admin:applications_summary')
+        data = self.client.get(url, {'format': 'json', 'granularity': 'day'}).json()
+        self.assertEqual((data['total_applications'], data['closed_applications']), (1, 0))
+
+        data = self.client.get(url, {
+            'format': 'json', 'granularity': 'day', 'include_archive': '1',
+        }).json()
+        self.assertEqual((data['total_applications'], data['closed_applications']), (2, 1))
+        self.assertEqual(data['avg_processing_secs'], 7200)
+        self.assertEqual(data['series'][0]['closed'], 1)
+        self.assertEqual(sum(b['count'] for b in data['processing_histogram']), 1)
+
+    def test_applications_summary_series(self):
+        cache.clear()
+        url = reverse('object_admin:applications_summary')
+        data = self.client.get(url, {'format': 'json', 'granularity': 'month'}).json()
+        self.assertEqual(data['granularity'], 'month')
+        self.assertEqual(len(data['series']), 1)
+        self.assertEqual(data['series'][0]['created'], 2)
+        self.assertEqual(data['series'][0]['conversion_rate'], 50.0)
+
+        # новая заявка меняет версию сводки, и кешированный ряд не отдаётся
+        with self.captureOnCommitCallbacks(execute=True):
+            Application.objects.create(name='C', phone='3')
+        data = self.client.get(url, {'format': 'json', 'granularity': 'month'}).json()
+        self.assertEqual(data['series'][0]['created'], 3)
+
+        resp = self.client.get(url, {'granularity': 'day'})
+        self.assertContains(resp, 'по дням')
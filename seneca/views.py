@@ -1,17 +1,22 @@
 from django.shortcuts import render
 from .serializers import *
-from rest_framework import viewsets, filters
+from .pagination import ApplicationPagination, BankPagination, CatalogPagination
+from .reports import ProcessingTimeHistogram
+from .idempotency import IdempotentCreateMixin
+from . import linkcheck
+from rest_framework import viewsets, filters, status
 from django_filters.rest_framework import DjangoFilterBackend
 from django.contrib.sites.shortcuts import get_current_site
 from django.contrib.admin.views.decorators import staff_member_required
 from django.http import JsonResponse
 from django.utils.decorators import method_decorator
 from django.views.generic import TemplateView
-import re
-import requests
-from urllib.parse import urlencode
-from django.db.models import F, DurationField, ExpressionWrapper, Avg, Count, Q
+from django.db import transaction
+from django.db.models import F, DurationField, ExpressionWrapper, Count, Q, Sum, DateField
+from django.db.models.functions import Trunc
+from django.core.cache import cache
 import datetime
+from django.utils import timezone
 from rest_framework.permissions import SAFE_METHODS, BasePermission
 from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
@@ -31,13 +36,15 @@ class IsAdminOrReadOnly(BasePermission):
 
 class BankViewSet(viewsets.ReadOnlyModelViewSet):
 
-    queryset = Bank.objects.all().order_by('name')
+    queryset = Bank.objects.all().order_by('name', 'id')
     serializer_class = BankSerializer
+    pagination_class = BankPagination
 
 class PhotoViewSet(viewsets.ModelViewSet):
     queryset = Photo.objects.all()
     serializer_class = PhotoSerializer
     permission_classes = [IsAdminOrReadOnly]
+    pagination_class = CatalogPagination
 
     # подключаем django-filter
     filter_backends = [DjangoFilterBackend]
@@ -48,28 +55,48 @@ class PhotoViewSet(viewsets.ModelViewSet):
         return super().get_queryset().filter(site=current_site)
 
 
-MONTH_ORDER = {
-    'Январь': 1, 'Февраль': 2, 'Март': 3, 'Апрель': 4,
-    'Май': 5, 'Июнь': 6, 'Июль': 7, 'Август': 8,
-    'Сентябрь': 9, 'Октябрь': 10, 'Ноябрь': 11, 'Декабрь': 12,
-}
+def published_range(year, month=None):
+    """
+    Полуинтервал [начало, конец) дат публикации за год (или месяц года);
+    None, если год не число или вне диапазона datetime.date.
+    """
+    try:
+        year = int(year)
+    except (TypeError, ValueError):
+        return None
+    # MAXYEAR не включаем: конец интервала ушёл бы в год MAXYEAR + 1
+    if not datetime.MINYEAR <= year < datetime.MAXYEAR:
+        return None
+    if month:
+        return (datetime.date(year, month, 1),
+                datetime.date(year + month // 12, month % 12 + 1, 1))
+    return datetime.date(year, 1, 1), datetime.date(year + 1, 1, 1)
+
 
 class VideoViewSet(viewsets.ModelViewSet):
     serializer_class = VideoSerializer
     queryset = Video.objects.all()
+    pagination_class = CatalogPagination
 
     def get_queryset(self):
 
         current_site = get_current_site(self.request)
         qs = super().get_queryset().filter(site=current_site)
 
+        # фильтры — диапазоны по published_on, их покрывает индекс (site, published_on)
         year = self.request.query_params.get('year')
-        if year:
-            qs = qs.filter(year=year)
-
         month = self.request.query_params.get('month')
-        if month:
-            qs = qs.filter(month=month)
+        number = month_number(month) if month else None
+        if month and number is None:
+            return qs.none()
+
+        if year:
+            bounds = published_range(year, number)
+            if bounds is None:
+                return qs.none()
+            qs = qs.filter(published_on__gte=bounds[0], published_on__lt=bounds[1])
+        elif number:
+            qs = qs.filter(published_on__month=number)
 
         return qs
 
@@ -80,10 +107,9 @@ class VideoViewSet(viewsets.ModelViewSet):
         years = (
             Video.objects
                  .filter(site=current_site)
-                 .values_list('year', flat=True)
-                 .distinct()
+                 .dates('published_on', 'year', order='DESC')
         )
-        return Response(sorted(years, reverse=True))
+        return Response([str(d.year) for d in years])
 
     @action(detail=False, methods=['get'])
     def months(self, request):
@@ -91,39 +117,98 @@ class VideoViewSet(viewsets.ModelViewSet):
         year = request.query_params.get('year')
         if not year:
             return Response([], status=400)
+        bounds = published_range(year)
+        if bounds is None:
+            return Response([])
 
         current_site = get_current_site(request)
         months = (
             Video.objects
-                 .filter(site=current_site, year=year)
-                 .values_list('month', flat=True)
-                 .distinct()
-        )
-        sorted_months = sorted(
-            months,
-            key=lambda m: MONTH_ORDER.get(m, 0),
-            reverse=True
+                 .filter(site=current_site,
+                         published_on__gte=bounds[0],
+                         published_on__lt=bounds[1])
+                 .dates('published_on', 'month', order='DESC')
         )
-        return Response(sorted_months)
+        return Response([MONTH_NAMES[d.month] for d in months])
+
+    @action(detail=False, methods=['get'])
+    def archive(self, request):
+        """Всё дерево «год → месяц → количество» одним запросом (из кеша)."""
+        return Response(Video.archive_tree(get_current_site(request)))
+
+
+class ApplicationSearchFilter(filters.SearchFilter):
+    """?search= через Application.objects.search (FTS и нормализованный телефон)."""
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '')
+        return queryset.search(query.replace('\x00', ''))
 
 
-class ApplicationViewSet(viewsets.ModelViewSet):
+class ApplicationViewSet(IdempotentCreateMixin, viewsets.ModelViewSet):
 
     queryset = Application.objects.all()
     serializer_class = ApplicationSerializer
+    pagination_class = ApplicationPagination
     # permission_classes = [IsAdminOrReadOnly]
 
 
 
     filter_backends = [
         DjangoFilterBackend,
-        filters.SearchFilter,
+        ApplicationSearchFilter,
         filters.OrderingFilter,
     ]
     filterset_fields = ['status']
-    search_fields    = ['name', 'phone']
     ordering_fields  = ['created_at', 'updated_at']
-    ordering         = ['-created_at']
+    ordering         = ['-created_at', '-id']
+
+    def perform_create(self, serializer):
+        # заявка и запись в outbox уведомлений — в одной транзакции
+        with transaction.atomic():
+            serializer.save()
+
+    # окно, в котором повтор телефона считается дублем при пакетной загрузке
+    bulk_dedupe_window = datetime.timedelta(hours=24)
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """
+        Пакетная загрузка заявок: один INSERT через bulk_create, дубли по
+        нормализованному телефону (внутри пачки и за последние сутки)
+        пропускаются, администраторам уходит одно сводное уведомление.
+        """
+        serializer = self.get_serializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+
+        since = timezone.now() - self.bulk_dedupe_window
+        phones = {normalize_phone(item['phone']) for item in serializer.validated_data}
+        seen = set(
+            Application.objects.filter(created_at__gte=since, phone_digits__in=phones)
+                               .values_list('phone_digits', flat=True)
+        )
+        to_create = []
+        skipped = []
+        for index, item in enumerate(serializer.validated_data):
+            phone = normalize_phone(item['phone'])
+            if phone in seen:
+                skipped.append({'index': index, 'phone': item['phone']})
+                continue
+            seen.add(phone)
+            to_create.append(Application(**item, phone_digits=phone))
+
+        with transaction.atomic():
+            created = Application.objects.bulk_create(to_create)
+            if created:
+                # bulk_create не шлёт post_save: уведомление и сводку пишем сами
+                AdminNotification.for_applications(created)
+                ApplicationStatusTransition.record_created(created)
+                ApplicationDailyStats.record(created)
+
+        return Response({
+            'created': self.get_serializer(created, many=True).data,
+            'skipped': skipped,
+        }, status=status.HTTP_201_CREATED)
 
 
 
@@ -132,6 +217,7 @@ class BlockViewSet(viewsets.ModelViewSet):
     queryset = Block.objects.all()
     serializer_class = BlockSerializer
     permission_classes = [IsAdminOrReadOnly]
+    pagination_class = CatalogPagination
 
     def get_queryset(self):
         current_site = get_current_site(self.request)
@@ -142,6 +228,7 @@ class FloorViewSet(viewsets.ModelViewSet):
     queryset = Floor.objects.select_related('block').all()
     serializer_class = FloorSerializer
     permission_classes = [IsAdminOrReadOnly]
+    pagination_class = CatalogPagination
 
     def get_queryset(self):
         current_site = get_current_site(self.request)
@@ -157,6 +244,7 @@ class PlanViewSet(viewsets.ModelViewSet):
     queryset = Plan.objects.select_related('floor__block').all()
     serializer_class = PlanSerializer
     permission_classes = [IsAdminOrReadOnly]
+    pagination_class = CatalogPagination
 
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['floor']
@@ -219,77 +307,32 @@ class DataIntegrityView(TemplateView):
 
 @method_decorator(staff_member_required, name='dispatch')
 class LinkCheckerView(TemplateView):
+    """
+    Отчёт по внешним ссылкам из сохранённых результатов LinkCheckResult;
+    в сеть не ходит — результаты обновляет команда check_links.
+    """
     template_name = 'link_checker.html'
-    timeout = 3
-    URL_PATTERN = re.compile(r'https?://[^\s\'"]+')
     permission_classes = [IsAdminUser]
 
-    def extract_urls(self):
-        urls = []
-        for v in Video.objects.all():
-            urls.append({
-                'model': 'Video',
-                'id': v.id,
-                'field': 'youtube_link',
-                'url': v.youtube_link,
-            })
-            for match in self.URL_PATTERN.findall(v.description or ''):
-                urls.append({
-                    'model': 'Video',
-                    'id': v.id,
-                    'field': 'description',
-                    'url': match,
-                })
-
-        for p in Plan.objects.all():
-            for match in self.URL_PATTERN.findall(p.description or ''):
-                urls.append({
-                    'model': 'Plan',
-                    'id': p.id,
-                    'field': 'description',
-                    'url': match,
-                })
-
-        return urls
-
-    def check_youtube_oembed(self, url):
-
-        params = {'url': url, 'format': 'json'}
-        oembed_url = f'https://www.youtube.com/oembed?{urlencode(params)}'
-        try:
-            resp = requests.get(oembed_url, timeout=self.timeout)
-            return resp.status_code
-        except Exception as e:
-            return f'oEmbed error: {e}'
-
-    def check_url(self, url):
-        head_error = None
-
-        try:
-            head = requests.head(url, allow_redirects=True, timeout=self.timeout)
-            if 200 <= head.status_code < 400:
-                if 'youtube.com' in url or 'youtu.be' in url:
-                    return self.check_youtube_oembed(url)
-                return head.status_code
-        except Exception as e:
-            head_error = str(e)
-
-        try:
-            get = requests.get(url, allow_redirects=True, timeout=self.timeout)
-            return get.status_code
-        except Exception as e_get:
-            return head_error or str(e_get)
-
     def get_context_data(self, **kwargs):
-        to_check = self.extract_urls()
+        stored = {r.url_hash: r for r in LinkCheckResult.objects.all()}
         results = []
-        for item in to_check:
-            status = self.check_url(item['url'])
-            ok = isinstance(status, int) and 200 <= status < 400
-            results.append({**item, 'status': status, 'ok': ok})
+        pending = []
+        for item in linkcheck.extract_urls():
+            result = stored.get(LinkCheckResult.hash_url(item['url']))
+            if result is None:
+                pending.append(item)
+                continue
+            results.append({
+                **item,
+                'status':     result.status,
+                'ok':         result.ok,
+                'latency_ms': result.latency_ms,
+                'checked_at': result.checked_at,
+            })
 
         broken = [r for r in results if not r['ok']]
-        return {'results': results, 'broken': broken}
+        return {'results': results, 'broken': broken, 'pending': pending}
 
     def render_to_response(self, context, **response_kwargs):
         req = self.request
@@ -301,6 +344,7 @@ class LinkCheckerView(TemplateView):
             return JsonResponse({
                 'all_checked': context['results'],
                 'broken': context['broken'],
+                'pending': context['pending'],
             }, safe=False)
         return super().render_to_response(context, **response_kwargs)
 
@@ -309,14 +353,23 @@ class LinkCheckerView(TemplateView):
 
 # views.py
 
+# время обработки архивной заявки: момент закрытия хранится в самой строке
+PROCESSING_DURATION = ExpressionWrapper(
+    F('closed_at') - F('created_at'), output_field=DurationField(),
+)
+
+
 @method_decorator(staff_member_required, name='dispatch')
 class ApplicationSummaryView(TemplateView):
     template_name = 'applications_summary.html'
     permission_classes = [IsAdminUser]
+    GRANULARITIES = ('day', 'week', 'month')
+    series_cache_timeout = 60 * 60
 
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
-        qs  = Application.objects.all()
+        # читаем дневные сводки (сотни строк), а не всю таблицу заявок
+        qs  = ApplicationDailyStats.objects.all()
 
         start_str = self.request.GET.get('start_date')
         end_str   = self.request.GET.get('end_date')
@@ -324,29 +377,44 @@ class ApplicationSummaryView(TemplateView):
         try:
             if start_str:
                 start = datetime.datetime.strptime(start_str, '%Y-%m-%d').date()
-                qs = qs.filter(created_at__date__gte=start)
+                qs = qs.filter(date__gte=start)
             if end_str:
                 end = datetime.datetime.strptime(end_str, '%Y-%m-%d').date()
-                qs = qs.filter(created_at__date__lte=end)
+                qs = qs.filter(date__lte=end)
         except ValueError:
             start_str = end_str = None
 
+        include_archive = self.request.GET.get('include_archive') in ('1', 'true', 'on')
         ctx.update({
-            'start_date': start_str or '',
-            'end_date':   end_str   or '',
+            'start_date':      start_str or '',
+            'end_date':        end_str   or '',
+            'include_archive': include_archive,
         })
 
-        total_count  = qs.count()
-        closed_count = qs.filter(status=Application.STATUS_CLOSED).count()
+        totals = qs.aggregate(
+            new=Sum('new_count'),
+            in_work=Sum('in_work_count'),
+            closed=Sum('closed_count'),
+            processing=Sum('processing_seconds'),
+        )
+        if include_archive:
+            # архив — только закрытые заявки; добавляем их одним агрегатом
+            archived = self.archive_queryset(start_str, end_str).aggregate(
+                closed=Count('id'),
+                processing=Sum(PROCESSING_DURATION),
+            )
+            totals['closed'] = (totals['closed'] or 0) + archived['closed']
+            if archived['processing']:
+                totals['processing'] = (
+                    (totals['processing'] or 0) + archived['processing'].total_seconds()
+                )
+        closed_count = totals['closed'] or 0
+        total_count  = (totals['new'] or 0) + (totals['in_work'] or 0) + closed_count
         conversion   = (closed_count / total_count * 100) if total_count else 0
 
-        closed_qs = qs.filter(status=Application.STATUS_CLOSED).annotate(
-            processing_time=ExpressionWrapper(
-                F('updated_at') - F('created_at'),
-                output_field=DurationField()
-            )
-        )
-        avg_duration = closed_qs.aggregate(avg_time=Avg('processing_time'))['avg_time']
+        avg_duration = None
+        if closed_count:
+            avg_duration = datetime.timedelta(seconds=(totals['processing'] or 0) / closed_count)
 
         if avg_duration:
             secs   = avg_duration.total_seconds()
@@ -357,7 +425,18 @@ class ApplicationSummaryView(TemplateView):
         else:
             days = hours = mins = secs_r = None
 
+        histogram = self.get_processing_histogram(start_str, end_str, include_archive)
+
+        granularity = self.request.GET.get('granularity')
+        if granularity not in self.GRANULARITIES:
+            granularity = None
+
         ctx.update({
+            'granularity':         granularity or '',
+            'series':              (
+                self.get_series(qs, granularity, start_str, end_str, include_archive)
+                if granularity else []
+            ),
             'total_count':         total_count,
             'closed_count':        closed_count,
             'conversion_rate':     round(conversion, 2),
@@ -366,9 +445,109 @@ class ApplicationSummaryView(TemplateView):
             'avg_hours':           hours,
             'avg_minutes':         mins,
             'avg_seconds':         secs_r,
+            'processing_percentiles': histogram.percentiles(50, 90, 99),
+            'processing_histogram':   histogram.buckets(),
         })
         return ctx
 
+    @staticmethod
+    def filter_created(qs, start_str, end_str):
+        # границы по created_at, а не created_at__date, чтобы работал индекс
+        if start_str:
+            start = datetime.datetime.strptime(start_str, '%Y-%m-%d')
+            qs = qs.filter(created_at__gte=timezone.make_aware(start))
+        if end_str:
+            end = datetime.datetime.strptime(end_str, '%Y-%m-%d') + datetime.timedelta(days=1)
+            qs = qs.filter(created_at__lt=timezone.make_aware(end))
+        return qs
+
+    def archive_queryset(self, start_str, end_str):
+        return self.filter_created(ArchivedApplication.objects.all(), start_str, end_str)
+
+    def get_processing_histogram(self, start_str, end_str, include_archive=False):
+        """
+        Один проход по закрытым заявкам периода: из БД читаются только
+        пары (создана, закрыта по журналу статусов), каждая сразу попадает
+        в гистограмму фиксированного размера. С include_archive — ещё один
+        проход по архиву.
+        """
+        qs = self.filter_created(
+            Application.objects.filter(status=Application.STATUS_CLOSED), start_str, end_str,
+        )
+        sources = [qs.with_closed_at().values_list('created_at', 'closed_at_ts')]
+        if include_archive:
+            sources.append(
+                self.archive_queryset(start_str, end_str).values_list('created_at', 'closed_at')
+            )
+
+        histogram = ProcessingTimeHistogram()
+        for source in sources:
+            for created_at, closed_at in source.iterator(chunk_size=2000):
+                histogram.add((closed_at - created_at).total_seconds())
+        return histogram
+
+    def get_series(self, qs, granularity, start_str, end_str, include_archive=False):
+        """
+        Ряд по дням/неделям/месяцам: один GROUP BY по дневным сводкам
+        (и, с include_archive, один GROUP BY по архиву).
+        Результат кешируется; ключ включает версию сводки, которая меняется
+        при любом изменении заявок, так что устаревший ряд не отдаётся.
+        """
+        key = (
+            f'applications-series:{ApplicationDailyStats.cache_version()}:'
+            f'{granularity}:{start_str or ""}:{end_str or ""}:{int(include_archive)}'
+        )
+        series = cache.get(key)
+        if series is not None:
+            return series
+
+        rows = (
+            qs.annotate(period=Trunc('date', granularity, output_field=DateField()))
+              .values('period')
+              .annotate(
+                  new=Sum('new_count'),
+                  in_work=Sum('in_work_count'),
+                  closed=Sum('closed_count'),
+                  processing=Sum('processing_seconds'),
+              )
+              .order_by('period')
+        )
+        archived = {}
+        if include_archive:
+            archived = {
+                row['period']: row
+                for row in self.archive_queryset(start_str, end_str)
+                    .annotate(period=Trunc('created_at', granularity, output_field=DateField()))
+                    .values('period')
+                    .annotate(closed=Count('id'), processing=Sum(PROCESSING_DURATION))
+                    .order_by()
+            }
+        rows = list(rows)
+        by_period = {row['period']: row for row in rows}
+        for period, extra in archived.items():
+            row = by_period.get(period)
+            if row is None:
+                row = {'period': period, 'new': 0, 'in_work': 0, 'closed': 0, 'processing': 0}
+                rows.append(row)
+            row['closed'] += extra['closed']
+            row['processing'] += extra['processing'].total_seconds()
+        rows.sort(key=lambda row: row['period'])
+
+        series = []
+        for row in rows:
+            created = row['new'] + row['in_work'] + row['closed']
+            series.append({
+                'period':              row['period'].isoformat(),
+                'created':             created,
+                'closed':              row['closed'],
+                'conversion_rate':     round(row['closed'] / created * 100, 2) if created else 0,
+                'avg_processing_secs': (
+                    row['processing'] / row['closed'] if row['closed'] else None
+                ),
+            })
+        cache.set(key, series, self.series_cache_timeout)
+        return series
+
     def render_to_response(self, context, **response_kwargs):
         req       = self.request
         want_json = req.GET.get('format') == 'json' or \
@@ -386,6 +565,12 @@ class ApplicationSummaryView(TemplateView):
                     if context['avg_processing_time'] else None
                 ),
             }
+            data['include_archive'] = context['include_archive']
+            data['processing_percentiles_secs'] = context['processing_percentiles']
+            data['processing_histogram'] = context['processing_histogram']
+            if context['granularity']:
+                data['granularity'] = context['granularity']
+                data['series'] = context['series']
             return JsonResponse(data)
 
         return super().render_to_response(context, **response_kwargs)
\ No newline at end of file
@@ -55,6 +55,25 @@ REST_FRAMEWORK = {
     ],
 }
 
+# курсорная пагинация API: размер страницы по умолчанию и потолок для ?page_size=
+API_PAGE_SIZE = 50
+API_MAX_PAGE_SIZE = 200
+
+# закрытые заявки старше стольких дней переносятся в архив (archive_applications)
+APPLICATION_ARCHIVE_DAYS = 180
+
+# сколько часов повтор POST с тем же Idempotency-Key возвращает сохранённый ответ
+IDEMPOTENCY_KEY_TTL_HOURS = 24
+
+# oEmbed YouTube: адрес (в тестах подменяется локальным сервером), таймаут
+# запроса в секундах и через сколько часов метаданные видео обновляются
+YOUTUBE_OEMBED_ENDPOINT = 'https://www.youtube.com/oembed'
+YOUTUBE_OEMBED_TIMEOUT = 3
+VIDEO_OEMBED_TTL_HOURS = 24 * 7
+
+# результаты проверки ссылок старше стольких часов check_links перепроверяет
+LINK_CHECK_TTL_HOURS = 24
+
 
 
 MIDDLEWARE = [
@@ -100,6 +119,17 @@ DATABASES = {
     }
 }
 
+# кеш отчётов и архива видео общий для всех воркеров и management-команд:
+# сброс после сохранения в одном процессе виден остальным. Таблицу кеша
+# создаёт миграция seneca 0018 (или manage.py createcachetable)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'seneca_cache',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators